@@ -0,0 +1,154 @@
+"""Check and measure `parse_description`.
+
+Every description of the lexical units and synsets of a loaded wordnet, a fixed corpus of
+descriptions with unusual markup, and random strings made of markup characters are parsed
+with `plwordnet.parse_description` and with the character-by-character parser of
+plwordnet 0.1.5. The results must be identical. Then both parsers are timed on the wordnet's
+descriptions, and their throughput is reported.
+
+    python benchmarks/descriptions.py plwordnet_4_2.plwn
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# `python benchmarks/...` puts this directory on the path, but not the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import plwordnet
+from plwordnet import Description
+
+
+CORPUS = [
+    '',
+    ' ',
+    'brak danych',
+    'NP',
+    'N',
+    'NPN',
+    '#',
+    '##',
+    '##K',
+    '##K:',
+    '##D: definicja',
+    '##K: og. ##D: definicja. [##P: przykład] {##L: http://example.com}',
+    '##D: definicja [##W: przykład 1] [##W: przykład 2]',
+    '##D: niedomknięty [##P: przykład',
+    '##D: niedomknięty {##L: http://example.com',
+    '[##P: tylko przykład]',
+    '[#P: zły przykład]',
+    '{#L: zły link}',
+    '{##L:}',
+    '##A1 {ból; smutek} neg [zły] [przykład]',
+    '#A1 - {ból; smutek} neg [zły] [przykład] ##D: po anotacji',
+    '##A2 {radość} [dobry]     [przykład] reszta',
+    '##A1 {ból',
+    '##A1 {ból} [zły',
+    '##A1',
+    '<##s> ##D: tagi <##/s>',
+    '<niedomknięty tag',
+    '##D: a#b',
+    'AOds 2A',
+    '  ##D:  spacje  ',
+    'Nie NP ##D: wielkie N',
+    '##D: zażółć gęślą jaźń [##P: źdźbło]',
+]
+
+
+def reference(text):
+    # `parse_description` of plwordnet 0.1.5
+    res, examples, links, unparsed = dict(), [], [], []
+    i, n, error = 0, len(text), False
+    while i < n:
+        char = text[i]
+        if char == '#' and i+2 < n and text[i+2] == 'A':
+            i += 6
+            while i < n and text[i] != '{': i += 1
+            while i < n and text[i] != '}': i += 1
+            while i < n and text[i] != '[': i += 1
+            while i < n and text[i] != ']': i += 1
+            while i < n and text[i] == ' ': i += 1
+            while i < n and text[i] != '[': i += 1
+            while i < n and text[i] != ']': i += 1
+            i += 1
+        elif char == '<':
+            j = text.find('>', i)
+            if j == -1: j = n
+            i = j + 1
+        elif char == '#' and i+2 < n:
+            marker = text[i+2]
+            i += 4
+            chars = []
+            while i < n and text[i] not in '[{#':
+                chars.append(text[i])
+                i += 1
+            res[marker] = ''.join(chars).strip(': ')
+        elif char == '[' and text[i:i+3] == '[##':
+            i += 5
+            j = text.find(']', i)
+            if j == -1: j = n
+            examples.append(text[i:j].strip(': '))
+            i = j + 1
+        elif char == '{' and text[i:i+3] == '{##':
+            i += 5
+            j = text.find('}', i)
+            if j == -1: j = n
+            links.append(text[i:j].strip())
+            i = j + 1
+        elif text[i:i+2] == 'NP':
+            i += 2
+        else:
+            unparsed.append(text[i])
+            i += 1
+            if char != ' ':
+                error = True
+    return error, Description(qualifier=res.get('K', None), definition=res.get('D', ''),
+                       examples=examples, links=links, unparsed=''.join(unparsed),from_synset=False)
+
+
+def fuzz(n, seed=0):
+    r = random.Random(seed)
+    alphabet = ['#', '##', '#A', '[', ']', '{', '}', '<', '>', 'N', 'P', 'NP', ' ', ':', 'A', 'x', 'ż', '[##', '{##']
+    return [''.join(r.choice(alphabet) for _ in range(r.randint(0, 30))) for _ in range(n)]
+
+
+def throughput(parse, texts, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for x in texts: parse(x)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(texts) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('src', help='path to the wordnet file passed to `plwordnet.load`')
+    parser.add_argument('--fuzz', type=int, default=100000, help='number of random strings to check')
+    parser.add_argument('-n', '--repeat', type=int, default=3, help='number of timed runs per parser')
+    args = parser.parse_args()
+
+    wn = plwordnet.load(args.src)
+    texts = [lu.description for lu in wn.lexical_units.values()]
+    for synset in wn.synsets.values():
+        texts += [synset.definition, synset.description]
+    texts = [x for x in texts if x]
+
+    for x in CORPUS + fuzz(args.fuzz) + texts:
+        expected, got = reference(x), plwordnet.parse_description(x)
+        assert got == expected, f'Parsed {x!r} as {got}, expected {expected}'
+    print(f'checked {len(CORPUS) + args.fuzz + len(texts)} descriptions')
+
+    before = throughput(reference, texts, args.repeat)
+    after = throughput(plwordnet.parse_description, texts, args.repeat)
+    print(f'{"parser":20} {"descriptions/s":>15}')
+    print(f'{"0.1.5":20} {before:15.0f}')
+    print(f'{"current":20} {after:15.0f}')
+
+
+if __name__ == '__main__':
+    main()
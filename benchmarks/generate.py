@@ -0,0 +1,399 @@
+"""Generate a synthetic wordnet XML file of any size, and a matching sentiment annotation CSV.
+
+The output has the elements and attributes of plWordNet XML that `plwordnet.load` reads:
+lexical units, synsets, synset and lexical relations, and relation types, including all
+relation types looked up by name by the library. A share of the synsets (`--english`) are
+English, with ` pwn` parts of speech and interlingual relations to Polish synsets.
+
+The shape of the data follows plWordNet rather than being uniform:
+
+- synsets have one to eight units, most of them one or two, and lemmas have heavy-tailed
+  numbers of senses (variants);
+- every synset but the roots gets a hypernym of the same part of speech. Half of the
+  synsets copy the hypernym of a random earlier synset instead of taking that synset, so
+  the numbers of hyponyms are heavy-tailed, and hierarchies have depths like plWordNet's
+  (growing with the logarithm of the size). A few synsets have two hypernyms, and a few
+  hypernym cycles are added;
+- descriptions use the `##K:`, `##D:`, `[##P: ...]`, `{##L: ...}` and `##A1 {...}` markup
+  read by `parse_description`, with a small share of malformed ones;
+- the sentiment CSV annotates a few percent of the Polish units, some of them twice.
+
+Every attribute of a synset or unit is computed from a hash of the seed and its id, so the
+output depends only on the arguments, and it is written as it is generated: apart from a
+four-byte counter per lemma to number its variants (eight bytes per unit, as there are
+`LEMMA_RATE` lemmas per unit), memory does not depend on the size of the output. Paths ending in `.gz`, `.bz2` or `.xz` are compressed.
+
+    python benchmarks/generate.py synthetic.xml.gz --synsets 3000000 --sentiment synthetic.csv
+"""
+
+import argparse
+import bisect
+import bz2
+import gzip
+import lzma
+import os
+import sys
+from array import array
+from itertools import accumulate
+from xml.sax.saxutils import quoteattr
+
+# `python benchmarks/...` puts this directory on the path, but not the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plwordnet.domains import DOMAINS
+
+
+MASK = (1 << 64) - 1
+# Units of synset `s` have ids `s * MAX_SIZE + i`, so the synset of a unit is known from its id
+MAX_SIZE = 8
+SUFFIX = ('', ' pwn')
+POS = ['rzeczownik', 'czasownik', 'przymiotnik', 'przysłówek']
+# The part of speech of a synset depends on its id modulo 100, so that a random synset of a
+# given part of speech can be drawn without an index
+POS_RESIDUES = [range(0, 60), range(60, 80), range(80, 97), range(97, 100)]
+POS_BY_RESIDUE = [pos for pos, residues in enumerate(POS_RESIDUES) for _ in residues]
+SIZE_WEIGHTS = list(accumulate([0.55, 0.25, 0.11, 0.05, 0.02, 0.01, 0.005, 0.005]))
+DOMAIN_IDS = [[x.id for x in DOMAINS.domains_by_pos[pos]] for pos in ('NOUN', 'VERB', 'ADJ', 'ADV')]
+
+# Chances per synset
+ROOT_RATE = 0.002
+COPY_RATE = 0.3
+SECOND_HYPERNYM_RATE = 0.03
+CYCLE_RATE = 0.001
+INSTANCE_RATE = 0.04
+MERONYM_RATE = 0.12
+SYNONYM_RATE = 0.35
+INTERLINGUAL_HYPERNYM_RATE = 0.1
+# Chances per unit
+DERIVATIVE_RATE = 0.25
+ANTONYM_RATE = 0.08
+SENTIMENT_RATE = 0.04
+SECOND_ANNOTATION_RATE = 0.5
+# Lemmas to draw from per unit (most of them remain unused, so most lemmas have one sense),
+# and the share of units which get one of the few common lemmas
+LEMMA_RATE = 2
+COMMON_RATE = 0.1
+COMMON_LEMMAS = 0.01
+MWE_RATE = 0.05
+
+# Keys of the hashes, so that every attribute of an id is drawn independently
+(SIZE, DOMAIN, ROOT, COPY, CANDIDATE, SECOND, CYCLE, INSTANCE, MERONYM, SYNONYM, INTERLINGUAL,
+ DERIVATIVE, ANTONYM, UNIT, LEMMA, MWE, TEXT, TAG_COUNT, SENTIMENT) = range(19)
+
+# Polish syllables are consonant-vowel and English ones consonant-vowel-consonant, so the
+# names of lemmas of the two languages never collide
+SYLLABLES = ([c + v for c in 'bcdfghjklłmnprstwzżśćń' for v in 'aeiouyąęó'],
+             [a + v + b for a in 'bcdfghklmnprstvw' for v in 'aeiou' for b in 'bdgklmnprst'])
+QUALIFIERS = ['og.', 'książk.', 'pot.', 'daw.', 'specj.', 'reg.', 'środ.', 'żart.']
+EMOTIONS = ['radość', 'zaufanie', 'cieszenie się na coś oczekiwanego', 'zaskoczenie czymś nieprzewidywanym',
+            'smutek', 'złość', 'strach', 'wstręt']
+VALUATIONS = ['użyteczność', 'dobro', 'prawda', 'wiedza', 'piękno', 'szczęście',
+              'nieużyteczność', 'krzywda', 'niewiedza', 'błąd', 'brzydota', 'nieszczęście']
+POLARITIES = ['- s', '- m', 'amb', '+ m', '+ s', '']
+
+SYNSET_RELATION = 'relacja pomiędzy synsetami'
+LEXICAL_RELATION = 'relacja leksykalna'
+# (id, name, type, inverse id, parent id)
+RELATION_TYPES = [
+    (10, 'hiponimia', SYNSET_RELATION, 11, None),
+    (11, 'hiperonimia', SYNSET_RELATION, 10, None),
+    (12, 'typ', SYNSET_RELATION, 13, None),
+    (13, 'egzemplarz', SYNSET_RELATION, 12, None),
+    (14, 'meronimia', SYNSET_RELATION, 15, None),
+    (15, 'holonimia', SYNSET_RELATION, 14, None),
+    (16, 'część', SYNSET_RELATION, 17, 14),
+    (17, 'całość', SYNSET_RELATION, 16, 15),
+    (20, 'hiperonimia_międzyjęzykowa', SYNSET_RELATION, 21, None),
+    (21, 'hiponimia_międzyjęzykowa', SYNSET_RELATION, 20, None),
+    (22, 'Syn_plWN-PWN', SYNSET_RELATION, 23, None),
+    (23, 'Syn_PWN-plWN', SYNSET_RELATION, 22, None),
+    (24, 'Hiper_plWN-PWN', SYNSET_RELATION, 25, None),
+    (25, 'Hipo_PWN-plWN', SYNSET_RELATION, 24, None),
+    (26, 'Hiper_PWN-plWN', SYNSET_RELATION, 27, None),
+    (27, 'Hipo_plWN-PWN', SYNSET_RELATION, 26, None),
+    (30, 'Hypernym', SYNSET_RELATION, 31, None),
+    (31, 'Hyponym', SYNSET_RELATION, 30, None),
+    (32, 'Instance_Hypernym', SYNSET_RELATION, 33, None),
+    (33, 'Instance_Hyponym', SYNSET_RELATION, 32, None),
+    (34, 'Part_Meronym', SYNSET_RELATION, 35, None),
+    (35, 'Part_Holonym', SYNSET_RELATION, 34, None),
+    (40, 'antonimia', LEXICAL_RELATION, 40, None),
+    (41, 'derywacyjność', LEXICAL_RELATION, None, None),
+    (42, 'Antonym', LEXICAL_RELATION, 42, None),
+    (43, 'Derivationally_Related', LEXICAL_RELATION, None, None),
+]
+INVERSE = {id: inverse for id, _, _, inverse, _ in RELATION_TYPES}
+# Relation type ids by language (Polish, English)
+HYPERNYM, INSTANCE_HYPERNYM, PART_MERONYM = (11, 30), (13, 32), (16, 34)
+MERONYMS = (14, 34)
+ANTONYMS, DERIVATIVES = (40, 42), (41, 43)
+# (synonym, hypernym) relation type ids from Polish to English synsets, and from English to Polish ones
+INTERLINGUAL_RELATIONS = ((22, 26), (23, 24))
+
+
+class Generator:
+    """Attributes and relations of a synthetic wordnet of `synsets` synsets, as functions of their ids.
+
+    Synsets `1..polish` are Polish, and the rest are English.
+    """
+
+    def __init__(self, synsets, *, english=0.3, seed=0):
+        assert synsets > 0 and 0 <= english < 1, 'Expected a positive number of synsets, and a share of English ones below 1'
+        self.seed = seed
+        self.synsets = synsets
+        self.polish = max(1, synsets - round(synsets * english))
+        self.ranges = ((1, self.polish + 1), (self.polish + 1, synsets + 1))
+        units = [sum(self.size(s) for s in range(*r)) for r in self.ranges]
+        self.lemmas = [max(1, int(x * LEMMA_RATE)) for x in units]
+        self.common = [max(1, int(x * COMMON_LEMMAS)) for x in self.lemmas]
+
+    def hash(self, key, id, k=0):
+        # splitmix64 of the seed, key, id and k
+        x = (self.seed * 0x9E3779B97F4A7C15 + key * 0xD1B54A32D192ED03 + id * 0xBF58476D1CE4E5B9 + k * 0x94D049BB133111EB) & MASK
+        x = (x ^ x >> 30) * 0xBF58476D1CE4E5B9 & MASK
+        x = (x ^ x >> 27) * 0x94D049BB133111EB & MASK
+        return x ^ x >> 31
+
+    def random(self, key, id, k=0):
+        return self.hash(key, id, k) / 2**64
+
+    def language(self, s):
+        return 0 if s <= self.polish else 1
+
+    def pos(self, s):
+        return POS_BY_RESIDUE[s % 100]
+
+    def size(self, s):
+        return bisect.bisect(SIZE_WEIGHTS, self.random(SIZE, s) * SIZE_WEIGHTS[-1]) + 1
+
+    def units(self, s):
+        return range(s * MAX_SIZE, s * MAX_SIZE + self.size(s))
+
+    def candidate(self, s, key, k=0, *, language=None, before=True):
+        # A random synset of the same part of speech in `language` (that of `s` by default),
+        # with a smaller id if `before`, or None if there is none
+        lo, hi = self.ranges[self.language(s) if language is None else language]
+        if before: hi = min(hi, s)
+        if hi <= lo: return None
+        h = self.hash(key, s, k)
+        residues = POS_RESIDUES[self.pos(s)]
+        # A random id, moved to a random residue of the part of speech in the same hundred
+        c = lo + h % (hi - lo)
+        c += residues[(h >> 40) % len(residues)] - c % 100
+        if c >= hi: c -= 100
+        return None if c < lo or c == s else c
+
+    def hypernym(self, s):
+        """Returns the first hypernym of synset `s`, or None for roots."""
+        if self.random(ROOT, s) < ROOT_RATE: return None
+        c = self.candidate(s, CANDIDATE)
+        if c is not None and self.random(COPY, s) < COPY_RATE:
+            # New synsets attach to the hypernym of a random synset, and so preferentially to ones with many hyponyms
+            h = self.hypernym(c)
+            if h is not None: return h
+        return c
+
+    def synset_relations(self, s):
+        """Yields (subject, relation type id, object) triples of synset `s`, followed by their inverses."""
+        lang, pos = self.language(s), self.pos(s)
+        triples = []
+        hypernym = self.hypernym(s)
+        if hypernym is not None:
+            instance = pos == 0 and self.random(INSTANCE, s) < INSTANCE_RATE
+            triples.append((hypernym, (INSTANCE_HYPERNYM if instance else HYPERNYM)[lang], s))
+            if self.random(SECOND, s) < SECOND_HYPERNYM_RATE:
+                c = self.candidate(s, SECOND)
+                if c is not None and c != hypernym: triples.append((c, HYPERNYM[lang], s))
+            # `s` also becomes a hypernym of its hypernym. Synsets with high ids have few
+            # hyponyms, so such cycles are only made among them, and few synsets reach them.
+            lo, hi = self.ranges[lang]
+            if hypernym >= hi - (hi - lo) // 4 and self.random(CYCLE, s) < CYCLE_RATE:
+                triples.append((s, HYPERNYM[lang], hypernym))
+        if pos == 0 and self.random(MERONYM, s) < MERONYM_RATE:
+            c = self.candidate(s, MERONYM, before=False)
+            part = lang == 0 and self.random(MERONYM, s, 1) < 0.5
+            if c is not None: triples.append((s, PART_MERONYM[lang] if part else MERONYMS[lang], c))
+        if lang == 0 and self.random(SYNONYM, s) < SYNONYM_RATE:
+            c = self.candidate(s, SYNONYM, language=1, before=False)
+            if c is not None: triples.append((s, INTERLINGUAL_RELATIONS[0][0], c))
+        if self.random(INTERLINGUAL, s) < INTERLINGUAL_HYPERNYM_RATE:
+            c = self.candidate(s, INTERLINGUAL, language=1 - lang, before=False)
+            if c is not None: triples.append((c, INTERLINGUAL_RELATIONS[1 - lang][1], s))
+        yield from triples
+        for a, rel, b in triples:
+            inverse = INVERSE[rel]
+            if inverse is not None: yield b, inverse, a
+
+    def lexical_relations(self, s):
+        """Yields (subject, relation type id, object) triples of the units of synset `s`."""
+        lang = self.language(s)
+        for u in self.units(s):
+            if self.random(DERIVATIVE, u) < DERIVATIVE_RATE:
+                c = self.candidate(s, DERIVATIVE, u, before=False)
+                if c is not None: yield u, DERIVATIVES[lang], self._unit(c, u)
+            if self.random(ANTONYM, u) < ANTONYM_RATE:
+                c = self.candidate(s, ANTONYM, u, before=False)
+                if c is not None:
+                    v = self._unit(c, u)
+                    yield u, ANTONYMS[lang], v
+                    yield v, ANTONYMS[lang], u
+
+    def _unit(self, s, k):
+        return s * MAX_SIZE + self.hash(UNIT, s, k) % self.size(s)
+
+    def lemma(self, u, lang):
+        # Most units get a random one of all lemmas, the rest one of the few common ones
+        k = self.hash(LEMMA, u)
+        lemmas = self.common[lang] if self.random(LEMMA, u, 1) < COMMON_RATE else self.lemmas[lang]
+        return k % lemmas
+
+    def name(self, lemma, lang):
+        # Names of lemmas are different words, and some of them are followed by a second word
+        name = _word(lemma, SYLLABLES[lang])
+        if self.random(MWE, lemma, lang) < MWE_RATE:
+            name += ' ' + _word(self.hash(MWE, lemma, lang) % self.lemmas[lang], SYLLABLES[lang])
+        return name
+
+    def words(self, key, id, n, lang=0):
+        syllables = SYLLABLES[lang]
+        return ' '.join(_word(self.hash(key, id, i) % len(syllables) ** 2, syllables) for i in range(n))
+
+    def description(self, u, lang):
+        r = self.random(TEXT, u)
+        if r < 0.3: return ''
+        definition = self.words(TEXT, u, 3 + self.hash(TEXT, u, 100) % 8, lang)
+        example = self.words(TEXT, u, 4 + self.hash(TEXT, u, 101) % 6, lang).capitalize()
+        if r < 0.6:
+            qualifier = QUALIFIERS[self.hash(TEXT, u, 102) % len(QUALIFIERS)]
+            return f'##K: {qualifier} ##D: {definition}. [##P: {example}.]'
+        if r < 0.7: return f'##D: {definition}. [##P: {example}.] {{##L: https://pl.wikipedia.org/wiki/{definition.split()[0]}}}'
+        if r < 0.8: return f'##D: {definition}.'
+        if r < 0.88: return 'brak danych'
+        if r < 0.95:
+            emotions = '; '.join(EMOTIONS[self.hash(TEXT, u, 103 + i) % len(EMOTIONS)] for i in range(2))
+            valuation = VALUATIONS[self.hash(TEXT, u, 105) % len(VALUATIONS)]
+            return f'##A1 {{{emotions}}} - s [{valuation}] [{example}.] ##D: {definition}.'
+        if r < 0.98: return f'[##P: {example}.] [##W: {definition}.]'
+        # Malformed markup
+        return (f'##D: {definition} [##P: {example}', f'<##s> ##D: {definition}. <##/s> AOds',
+                f'{definition} ##D: {example}')[self.hash(TEXT, u, 106) % 3]
+
+    def sentiment_rows(self, u, name, variant, pos):
+        # Rows of the sentiment CSV of unit `u`
+        rows = 1 + (self.random(SENTIMENT, u, 1) < SECOND_ANNOTATION_RATE)
+        for i in range(rows):
+            h = self.hash(SENTIMENT, u, 2 + i)
+            emotions = ';'.join(EMOTIONS[h >> (8 * j) & 7] for j in range(h % 3)) or 'NULL'
+            valuations = ';'.join(VALUATIONS[(h >> (8 * j + 32)) % len(VALUATIONS)] for j in range((h >> 4 & 1) + 1)) or 'NULL'
+            polarity = POLARITIES[(h >> 56) % len(POLARITIES)]
+            example = self.words(SENTIMENT, u * 2 + i, 5).capitalize() + '.' if h >> 60 & 1 else 'NULL'
+            yield f'"{name}",{variant},{pos},{"NULL" if not polarity else "1"},"{emotions}","{valuations}","{polarity}","{example}",NULL\n'
+
+    def write(self, file, sentiment=None):
+        """Writes the XML to the text file `file`, and the sentiment CSV to `sentiment`, if given.
+
+        Returns the numbers of written units, synsets, synset relations and lexical relations.
+        """
+        counts = dict(units=0, synsets=0, synset_relations=0, lexical_relations=0)
+        out = _Buffer(file)
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n<array-list owner="" date="2024-01-01" version="synthetic">\n')
+        if sentiment is not None:
+            sentiment.write('lemat,wariant,pos,nacechowanie,emocje,wartosci,polaryzacja,przyklad1,przyklad2\n')
+        variants = [array('I', bytes(4 * n)) for n in self.lemmas]
+        for s in range(1, self.synsets + 1):
+            lang, pos = self.language(s), self.pos(s)
+            pos_name = POS[pos] + SUFFIX[lang]
+            domains = DOMAIN_IDS[pos]
+            # Earlier domains of every part of speech are more common
+            domain = quoteattr(domains[int(self.random(DOMAIN, s) ** 2 * len(domains))])
+            for u in self.units(s):
+                lemma = self.lemma(u, lang)
+                counter = variants[lang]
+                counter[lemma] += 1
+                name, variant = self.name(lemma, lang), counter[lemma]
+                tag_count = int(1 / (self.random(TAG_COUNT, u) + 0.01)) - 1
+                out.write(f'<lexical-unit id="{u}" name={quoteattr(name)} pos="{pos_name}" tagcount="{tag_count}" '
+                          f'domain={domain} desc={quoteattr(self.description(u, lang))} workstate="Zrobiony" '
+                          f'source="użytkownika" variant="{variant}"/>\n')
+                counts['units'] += 1
+                if sentiment is not None and lang == 0 and self.random(SENTIMENT, u) < SENTIMENT_RATE:
+                    sentiment.writelines(self.sentiment_rows(u, name, variant, pos_name))
+        for s in range(1, self.synsets + 1):
+            definition = f'##D: {self.words(TEXT, -s, 6, self.language(s))}.' if self.random(TEXT, -s) < 0.3 else ''
+            abstract = 'true' if self.random(TEXT, -s, 1) < 0.05 else 'false'
+            out.write(f'<synset id="{s}" workstate="Zrobiony" split="1" owner="" definition={quoteattr(definition)} '
+                      f'desc="" abstract="{abstract}">\n')
+            out.write(''.join(f'<unit-id>{u}</unit-id>\n' for u in self.units(s)))
+            out.write('</synset>\n')
+            counts['synsets'] += 1
+        for s in range(1, self.synsets + 1):
+            for a, rel, b in self.synset_relations(s):
+                out.write(f'<synsetrelations parent="{a}" child="{b}" relation="{rel}" valid="true" owner=""/>\n')
+                counts['synset_relations'] += 1
+        for s in range(1, self.synsets + 1):
+            for a, rel, b in self.lexical_relations(s):
+                out.write(f'<lexicalrelations parent="{a}" child="{b}" relation="{rel}" valid="true" owner=""/>\n')
+                counts['lexical_relations'] += 1
+        for id, name, type, inverse, parent in RELATION_TYPES:
+            attrs = (f' reverse="{inverse}"' if inverse is not None else '') + (f' parent="{parent}"' if parent is not None else '')
+            out.write(f'<relationtypes id="{id}" type="{type}"{attrs} name={quoteattr(name)} description={quoteattr(name)} '
+                      f'posstr="{",".join(POS)}" autoreverse="false" display={quoteattr(f"<x#> {name} <y#>")} shortcut="{name[:4]}">\n'
+                      f'<test text={quoteattr(f"<x#> {name} <y#>")} pos="rzeczownik"/>\n</relationtypes>\n')
+        out.write('</array-list>\n')
+        out.flush()
+        return counts
+
+
+def _word(x, syllables):
+    # A different word for every number, of at least two syllables
+    x, parts = x + len(syllables), []
+    while x:
+        x, i = divmod(x, len(syllables))
+        parts.append(syllables[i])
+    return ''.join(parts)
+
+
+class _Buffer:
+    # Joins small writes into large ones
+    __slots__ = 'file parts size'.split()
+
+    def __init__(self, file):
+        self.file, self.parts, self.size = file, [], 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += 1
+        if self.size >= 4096: self.flush()
+
+    def flush(self):
+        self.file.write(''.join(self.parts))
+        self.parts, self.size = [], 0
+
+
+def open_text(path):
+    """Opens `path` for writing text, compressed according to its extension."""
+    opener = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}.get(os.path.splitext(path)[1], open)
+    return opener(path, 'wt', encoding='utf-8', newline='')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dst', help='path of the XML file to write')
+    parser.add_argument('--synsets', type=int, default=300000, help='number of synsets')
+    parser.add_argument('--english', type=float, default=0.3, help='share of English synsets')
+    parser.add_argument('--seed', type=int, default=0, help='seed of all random choices')
+    parser.add_argument('--sentiment', help='path of the sentiment annotation CSV to write')
+    args = parser.parse_args()
+
+    generator = Generator(args.synsets, english=args.english, seed=args.seed)
+    with open_text(args.dst) as file:
+        if args.sentiment is None:
+            counts = generator.write(file)
+        else:
+            with open_text(args.sentiment) as sentiment:
+                counts = generator.write(file, sentiment)
+    print(', '.join(f'{v} {k.replace("_", " ")}' for k, v in counts.items()), f'({os.path.getsize(args.dst) / 2**20:.1f} MiB)')
+
+
+if __name__ == '__main__':
+    main()
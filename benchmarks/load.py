@@ -0,0 +1,77 @@
+"""Measure wall time and peak memory of `plwordnet.load`.
+
+Every measurement runs in a fresh interpreter, so that the peak resident set size of one
+run does not leak into the next. Pass `--against` with the path to another checkout of
+this repository to compare loaders, for example:
+
+    git worktree add ../plwordnet-old <revision>
+    python benchmarks/load.py plwordnet_4_2.xml --against ../plwordnet-old
+
+Pass `--workers` (possibly many times) to measure parallel loading of this checkout with the
+given numbers of processes, for example `--workers 1 2 4 8`.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+CHILD = '''
+import json, resource, sys, time
+import plwordnet
+
+def peak_rss():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+src, sentiment, kwargs = sys.argv[1], sys.argv[2] or None, json.loads(sys.argv[3])
+before = peak_rss()
+start = time.perf_counter()
+wn = plwordnet.load(src, sentiment, **kwargs)
+elapsed = time.perf_counter() - start
+print(json.dumps({'time': elapsed, 'peak_rss': peak_rss(), 'base_rss': before,
+                  'lexical_units': len(wn.lexical_units), 'synsets': len(wn.synsets)}))
+'''
+
+
+def measure(tree, src, sentiment=None, **kwargs):
+    # `python -c` puts the working directory first on the path, so run from inside the checkout
+    tree = os.path.abspath(tree)
+    args = [sys.executable, '-c', CHILD, os.path.abspath(src),
+            sentiment and os.path.abspath(sentiment) or '', json.dumps(kwargs)]
+    out = subprocess.run(args, cwd=tree, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('src', help='path to the wordnet file passed to `plwordnet.load`')
+    parser.add_argument('--sentiment', help='path to the sentiment annotation CSV')
+    parser.add_argument('--against', action='append', default=[], metavar='DIR',
+                        help='another checkout of this repository to measure (may be repeated)')
+    parser.add_argument('--full-parse', action='store_true', help='pass `full_parse=True` to the loader')
+    parser.add_argument('--workers', type=int, nargs='+', default=[], metavar='N',
+                        help='also load with `workers=N` processes (only this checkout)')
+    parser.add_argument('-n', '--repeat', type=int, default=3, help='number of runs per checkout')
+    args = parser.parse_args()
+
+    kwargs = {'full_parse': True} if args.full_parse else {}
+    configs = [(os.path.relpath(tree), tree, kwargs) for tree in [ROOT] + args.against]
+    configs += [(f'{os.path.relpath(ROOT)} workers={n}', ROOT, dict(kwargs, workers=n)) for n in args.workers]
+    # Peak RSS is only that of the main process, workers are not included
+    print(f'{"checkout":40} {"time [s]":>10} {"peak RSS [MiB]":>15} {"load RSS [MiB]":>15}')
+    for name, tree, config in configs:
+        runs = [measure(tree, args.src, args.sentiment, **config) for _ in range(args.repeat)]
+        best = min(x['time'] for x in runs)
+        peak = max(x['peak_rss'] for x in runs)
+        grew = max(x['peak_rss'] - x['base_rss'] for x in runs)
+        print(f'{name:40} {best:10.2f} {peak / 2**20:15.1f} {grew / 2**20:15.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Compare memory and query latency of relation indexes.
+
+Builds the `Relations` store used by `Wordnet` and, for reference, the list of triples with
+`defaultdict(set)` indexes used by older versions, from the synset and lexical relations of
+a loaded wordnet. Reports bytes allocated per triple and the mean latency of pattern queries
+with different fields bound.
+
+    python benchmarks/relations.py plwordnet_4_2.plwn
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+# `python benchmarks/...` puts this directory on the path, but not the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import plwordnet
+from plwordnet.graph import Relations
+
+
+class SetIndex:
+    # The relation indexes of plwordnet 0.1.5
+    def __init__(self, triples):
+        self.triples = list(triples)
+        self.s, self.p, self.o = defaultdict(set), defaultdict(set), defaultdict(set)
+        for i, (s, p, o) in enumerate(self.triples):
+            self.s[s].add(i)
+            self.p[p].add(i)
+            self.o[o].add(i)
+
+    def where(self, s=None, p=None, o=None):
+        found = None
+        for index, key in ((self.p, p), (self.s, s), (self.o, o)):
+            if key is None: continue
+            found = index[key] if found is None else found.intersection(index[key])
+        return found
+
+
+def build(factory, triples):
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = factory(triples)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return index, size, elapsed
+
+
+def latency(index, patterns):
+    start = time.perf_counter()
+    for pattern in patterns:
+        for _ in index.where(**pattern): pass
+    return (time.perf_counter() - start) / len(patterns)
+
+
+def patterns(triples, rng, n):
+    # Query shapes from the most to the least selective, with keys of existing triples. Hub
+    # queries bind the object of one of the triples whose object has the most relations.
+    sample = [triples[rng.randrange(len(triples))] for _ in range(n)]
+    hubs = set(o for o, _ in Counter(o for _, _, o in triples).most_common(20))
+    hub_triples = [t for t in triples if t[2] in hubs]
+    hub_sample = [hub_triples[rng.randrange(len(hub_triples))] for _ in range(n)]
+    shapes = {
+        's': (sample, lambda s, p, o: dict(s=s)),
+        'o': (sample, lambda s, p, o: dict(o=o)),
+        's+p': (sample, lambda s, p, o: dict(s=s, p=p)),
+        'p+o': (sample, lambda s, p, o: dict(p=p, o=o)),
+        'p+o hub': (hub_sample, lambda s, p, o: dict(p=p, o=o)),
+        'p': (sample, lambda s, p, o: dict(p=p)),
+    }
+    return {name: [shape(*t) for t in ts] for name, (ts, shape) in shapes.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('src', help='path to the wordnet file passed to `plwordnet.load`')
+    parser.add_argument('-n', '--queries', type=int, default=2000, help='number of queries of every shape')
+    args = parser.parse_args()
+
+    wn = plwordnet.load(args.src)
+    rng = random.Random(0)
+    for kind in 'synset lexical'.split():
+        triples = list(getattr(wn, f'{kind}_relations'))
+        queries = patterns(triples, rng, args.queries)
+        print(f'{kind} relations: {len(triples)} triples')
+        print(f'  {"index":10} {"build [s]":>10} {"bytes/triple":>13}' + ''.join(f' {x + " [us]":>12}' for x in queries))
+        for name, factory in (('sets', SetIndex), ('csr', lambda x: Relations.from_triples(x))):
+            index, size, elapsed = build(factory, triples)
+            times = [latency(index, x) * 1e6 for x in queries.values()]
+            print(f'  {name:10} {elapsed:10.2f} {size / len(triples):13.1f}' + ''.join(f' {x:12.1f}' for x in times))
+            del index
+
+
+if __name__ == '__main__':
+    main()
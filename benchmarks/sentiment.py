@@ -0,0 +1,68 @@
+"""Measure attaching sentiment annotations to a loaded wordnet.
+
+The wordnet is loaded without annotations in a fresh interpreter (a snapshot is memory-mapped),
+and then `Wordnet.load_sentiment` attaches the annotation CSV, replaces it with the same file
+again, and the sentiment index is built and used to score batches of lexical unit ids. Wall time
+and growth of the peak resident set size of each step are reported.
+
+    python benchmarks/sentiment.py plwordnet_4_2.plwn plwordnet_4_2_emo.csv
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+CHILD = '''
+import json, random, resource, sys, time
+import plwordnet
+
+def peak_rss():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+src, sentiment = sys.argv[1], sys.argv[2]
+wn = plwordnet.load(src, mmap=True) if src.endswith('.plwn') else plwordnet.load(src)
+res = dict()
+
+def step(name, f):
+    before = peak_rss()
+    start = time.perf_counter()
+    f()
+    res[name] = (time.perf_counter() - start, peak_rss() - before)
+
+step('load_sentiment', lambda: wn.load_sentiment(sentiment))
+step('reload (replace)', lambda: wn.load_sentiment(sentiment))
+step('sentiment_index', wn.sentiment_index)
+index = wn.sentiment_index()
+ids = list(index.rows) + random.Random(0).sample(list(wn.lexical_units), min(len(wn.lexical_units), 100000))
+batches = [ids[i:i+1000] for i in range(0, len(ids), 1000)]
+step('score', lambda: [index.score(x) for x in batches])
+res['annotations'], res['scored ids'] = wn.sentiment_count, len(ids)
+print(json.dumps(res))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('src', help='path to the wordnet file passed to `plwordnet.load`')
+    parser.add_argument('sentiment', help='path to the sentiment annotation CSV')
+    args = parser.parse_args()
+
+    # `python -c` puts the working directory first on the path, so run from inside the checkout
+    out = subprocess.run([sys.executable, '-c', CHILD, os.path.abspath(args.src), os.path.abspath(args.sentiment)],
+                         cwd=ROOT, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    res = json.loads(out.splitlines()[-1])
+    print(f'{res.pop("annotations")} annotations, {res.pop("scored ids")} scored ids')
+    print(f'{"step":20} {"time [s]":>10} {"peak RSS growth [MiB]":>22}')
+    for name, (elapsed, grew) in res.items():
+        print(f'{name:20} {elapsed:10.2f} {grew / 2**20:22.1f}')
+
+
+if __name__ == '__main__':
+    main()
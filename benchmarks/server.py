@@ -0,0 +1,92 @@
+"""Measure throughput and latency of the query server on a local unix socket.
+
+The server is started in a fresh process for every `--max-batch` value (1 turns batching
+off), and `--concurrency` tasks of one client process keep sending a mix of `find`, relation,
+hypernym and similarity queries over a pool of as many connections for `--seconds` seconds.
+Queries use random ids and lemmas of the wordnet, which is also loaded by the client.
+
+    python benchmarks/server.py plwordnet_4_2.plwn --max-batch 1 256 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+# `python benchmarks/...` puts this directory on the path, but not the repository root
+sys.path.insert(0, ROOT)
+
+import plwordnet
+from plwordnet.server import Client
+
+
+def queries(wn, seed=0):
+    rnd = random.Random(seed)
+    synsets, units, names = list(wn.synsets), list(wn.lexical_units), [x for x in wn.lexical_units_by_name]
+    while True:
+        kind = rnd.randrange(5)
+        if kind == 0: yield 'find', dict(lemma=rnd.choice(names))
+        elif kind == 1: yield 'synset_relations_where', dict(subject=rnd.choice(synsets))
+        elif kind == 2: yield 'lexical_relations_where', dict(object=rnd.choice(units))
+        elif kind == 3: yield 'hypernyms', dict(synset=rnd.choice(synsets))
+        else: yield 'similarity', dict(a=rnd.choice(synsets), b=rnd.choice(synsets), measure='wup')
+
+
+async def run(path, wn, concurrency, seconds):
+    latencies, source = [], queries(wn)
+    async with Client(path=path, pool_size=concurrency) as client:
+        await client.health()
+        # Hierarchies and similarity engines are built on first use, before timing starts
+        await client.similarity(a=next(iter(wn.synsets)), b=next(iter(wn.synsets)), measure='wup')
+        deadline = time.perf_counter() + seconds
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                method, params = next(source)
+                start = time.perf_counter()
+                await client.call(method, **params)
+                latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        health = await client.health()
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)], health
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('src', help='path to the wordnet file passed to `plwordnet.load` (a snapshot is memory-mapped)')
+    parser.add_argument('--max-batch', type=int, nargs='+', default=[1, 256], help='batch sizes of the server to compare')
+    parser.add_argument('--concurrency', type=int, default=64, help='number of concurrent queries')
+    parser.add_argument('--seconds', type=float, default=10, help='duration of every measurement')
+    args = parser.parse_args()
+
+    wn = plwordnet.load(args.src, mmap=True) if args.src.endswith('.plwn') else plwordnet.load(args.src)
+    print(f'{"max batch":>10} {"queries/s":>10} {"p50 [ms]":>9} {"p99 [ms]":>9} {"calls/batch":>12}')
+    for max_batch in args.max_batch:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'plwordnet.sock')
+            server = subprocess.Popen([sys.executable, '-m', 'plwordnet.server', os.path.abspath(args.src), '--unix', path,
+                                       '--max-batch', str(max_batch)], cwd=ROOT, stderr=subprocess.DEVNULL)
+            try:
+                while not os.path.exists(path):
+                    if server.poll() is not None: raise RuntimeError('The server exited')
+                    time.sleep(0.05)
+                rate, p50, p99, health = asyncio.run(run(path, wn, args.concurrency, args.seconds))
+            finally:
+                server.terminate()
+                server.wait()
+        per_batch = health['calls'] / max(health['batches'], 1)
+        print(f'{max_batch:10} {rate:10.0f} {p50 * 1000:9.2f} {p99 * 1000:9.2f} {per_batch:12.1f}')
+
+
+if __name__ == '__main__':
+    main()
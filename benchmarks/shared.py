@@ -0,0 +1,79 @@
+"""Measure memory used by many worker processes that query the same wordnet.
+
+Every worker loads the wordnet on its own (as gunicorn workers without preloading do), runs
+a batch of `find`, relation and hypernym queries, and reports its proportional set size
+(PSS), in which pages shared between processes are split evenly among them. The sum of PSS
+over all workers is the physical memory they use together. Requires Linux.
+
+    python benchmarks/shared.py plwordnet_4_2.plwn --workers 8 --mmap
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+# `python benchmarks/...` puts this directory on the path, but not the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import plwordnet
+
+
+def smaps_rollup():
+    res = dict()
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                res[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    return res
+
+
+def worker(args, barrier, results):
+    start = time.perf_counter()
+    wn = plwordnet.load(args.src, **({'mmap': True} if args.mmap else {}))
+    loaded = time.perf_counter() - start
+    rng = random.Random(0)
+    names = list(wn.lexical_units_by_name)
+    synsets = list(wn.synsets)
+    start = time.perf_counter()
+    for _ in range(args.queries):
+        for lu in wn.find(rng.choice(names)):
+            wn.lexical_relations_where(subject=lu)
+        synset = rng.choice(synsets)
+        wn.synset_relations_where(object=synset)
+        wn.hypernyms(synset)
+        wn.hyponyms(synset)
+    queried = time.perf_counter() - start
+    barrier.wait()
+    mem = smaps_rollup()
+    results.put((loaded, queried, mem['Rss'], mem['Pss'], mem['Private_Clean'] + mem['Private_Dirty']))
+    barrier.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('src', help='path to the wordnet file passed to `plwordnet.load`')
+    parser.add_argument('-w', '--workers', type=int, default=4, help='number of worker processes')
+    parser.add_argument('-q', '--queries', type=int, default=10000, help='number of query rounds per worker')
+    parser.add_argument('--mmap', action='store_true', help='memory-map the snapshot instead of reading it')
+    args = parser.parse_args()
+
+    barrier, results = multiprocessing.Barrier(args.workers), multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=worker, args=(args, barrier, results)) for _ in range(args.workers)]
+    for p in procs: p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs: p.join()
+
+    mib = 2**20
+    print(f'{"worker":>6} {"load [s]":>9} {"queries [s]":>12} {"RSS [MiB]":>10} {"PSS [MiB]":>10} {"private [MiB]":>14}')
+    for i, (loaded, queried, rss, pss, private) in enumerate(rows):
+        print(f'{i:6} {loaded:9.3f} {queried:12.3f} {rss / mib:10.1f} {pss / mib:10.1f} {private / mib:14.1f}')
+    print(f'{"total":>6} {"":9} {"":12} {sum(x[2] for x in rows) / mib:10.1f} '
+          f'{sum(x[3] for x in rows) / mib:10.1f} {sum(x[4] for x in rows) / mib:14.1f}')
+
+
+if __name__ == '__main__':
+    main()
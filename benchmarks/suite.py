@@ -0,0 +1,311 @@
+"""Benchmark suite of the hot paths: loading, lookups, relation queries and traversals.
+
+Every benchmark runs in a fresh interpreter, so that the peak resident set size of one does not
+leak into the next. A benchmark first sets up its input (loading the wordnet from a pickle,
+unless loading is what it measures), and then its body is timed `--repeat` times. Reported are
+the best and median time of the body, the time per operation (a query, or the whole body),
+and the growth of the peak resident set size during the first run of the body.
+
+The XML file is converted once into compressed copies, which are kept in `--workdir` (a
+temporary directory by default). The pickle and the snapshot are written there by the
+benchmarked checkout itself, as older versions cannot read the ones of newer versions. Lookups
+use random lemmas and ids drawn with a fixed seed, so every run measures the same queries.
+
+    python benchmarks/suite.py plwordnet_4_2.xml --json results.json
+    python benchmarks/suite.py plwordnet_4_2.xml --compare results.json --threshold 0.1
+    python benchmarks/suite.py --synthetic 1000000 --workdir /tmp/plwordnet-suite
+
+With `--synthetic`, the XML file of the given number of synsets is written to the work
+directory by `benchmarks/generate.py` instead (with a fixed seed), so the suite can run
+without plWordNet, and at sizes it will only reach in the future.
+
+With `--compare`, the times are compared to a previous `--json` file, and the exit status is 1
+if any benchmark became slower by more than `--threshold` (and by more than a few
+milliseconds). `--tree` runs the benchmarks against another checkout of this repository,
+and `--only` selects benchmarks by name prefix. Benchmarks of features the checkout does not
+have (snapshots or traversals) are reported as unsupported, and all other errors as failures.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+# `python -c` puts the working directory first on the path, so the child imports the checkout it runs in
+CHILD = f'import sys; sys.path.append({HERE!r}); import suite; suite.child(sys.argv[1:])'
+SEED = 0
+QUERIES = 10000
+# Differences of times below this many seconds are not reported as regressions
+NOISE = 0.005
+FORMATS = {'xz': 'lzma', 'gz': 'gzip', 'bz2': 'bz2'}
+
+
+# Benchmarks are (setup, body) pairs. `setup(files)` returns the argument of `body`, which
+# returns the number of operations it made.
+
+def _load(name, **kwargs):
+    import plwordnet
+
+    def body(path):
+        plwordnet.load(path, **kwargs)
+        return 1
+    return lambda files: files[name], body
+
+
+def _wordnet(files):
+    import plwordnet
+    return plwordnet.load(files['pkl'])
+
+
+def _sample(xs, n, seed=SEED):
+    import random
+    xs = sorted(xs)
+    rnd = random.Random(seed)
+    return [rnd.choice(xs) for _ in range(n)]
+
+
+def _queries(make):
+    # Sets up the wordnet and a list of queries, and runs them one by one
+    def setup(files):
+        wn = _wordnet(files)
+        return wn, make(wn)
+
+    def body(state):
+        wn, queries = state
+        for f in queries: f()
+        return len(queries)
+    return setup, body
+
+
+def _find(wn):
+    names = _sample(wn.lexical_units_by_name, QUERIES // 2)
+    units = _sample(wn.lexical_units, QUERIES // 2)
+    queries = [lambda x=x: wn.find(x) for x in names]
+    return queries + [lambda x=f'{wn.lexical_units[id].name}.{wn.lexical_units[id].variant}': wn.find(x) for id in units]
+
+
+def _where(kind, field=None, predicate=None):
+    # Queries of relations of random subjects or objects (`field`), or of one predicate (given by name), repeated
+    def make(wn):
+        where = getattr(wn, f'{kind}_relations_where')
+        table = wn.synsets if kind == 'synset' else wn.lexical_units
+        pattern = {} if predicate is None else dict(predicate=wn.relation_by_name[predicate].id)
+        if field is None: return [lambda: where(**pattern)] * 10
+        return [lambda x=x: where(**{field: x}, **pattern) for x in _sample(table, QUERIES)]
+    return _queries(make)
+
+
+def _hypernym_paths(wn):
+    return [lambda x=wn.synsets[x]: wn.hypernym_paths(x, full_search=True) for x in _sample(wn.synsets, QUERIES // 10)]
+
+
+def _neighbourhood(wn):
+    traversal = wn.synset_traversal(direction='both')
+    return [lambda x=x: traversal.neighbourhood(x, 2) for x in _sample(wn.synsets, QUERIES // 10)]
+
+
+def _shortest_path(wn):
+    traversal = wn.synset_traversal(direction='both')
+    pairs = zip(_sample(wn.synsets, QUERIES // 100), _sample(wn.synsets, QUERIES // 100, SEED + 1))
+    return [lambda a=a, b=b: traversal.shortest_path(a, b) for a, b in pairs]
+
+
+def _parse_descriptions():
+    def body(wn):
+        wn.parse_descriptions()
+        return 1
+    return _wordnet, body
+
+
+def _dump(extension):
+    def setup(files):
+        return _wordnet(files), os.path.join(files['dir'], f'dump{extension}')
+
+    def body(state):
+        wn, path = state
+        wn.dump(path)
+        return 1
+    return setup, body
+
+
+BENCHMARKS = {
+    'load/xml': lambda: _load('xml'),
+    'load/xml-full-parse': lambda: _load('xml', full_parse=True),
+    'load/xz': lambda: _load('xz'),
+    'load/gz': lambda: _load('gz'),
+    'load/bz2': lambda: _load('bz2'),
+    'load/pkl': lambda: _load('pkl'),
+    'load/plwn': lambda: _load('plwn'),
+    'load/plwn-mmap': lambda: _load('plwn', mmap=True),
+    'find': lambda: _queries(_find),
+    'where/synset-subject': lambda: _where('synset', 'subject'),
+    'where/synset-subject-predicate': lambda: _where('synset', 'subject', predicate='hiperonimia'),
+    'where/synset-predicate': lambda: _where('synset', predicate='hiperonimia'),
+    'where/lexical-object': lambda: _where('lexical', 'object'),
+    'hypernym-paths/full-search': lambda: _queries(_hypernym_paths),
+    'traversal/neighbourhood': lambda: _queries(_neighbourhood),
+    'traversal/shortest-path': lambda: _queries(_shortest_path),
+    'parse-descriptions': _parse_descriptions,
+    'dump/pkl': lambda: _dump('.pkl'),
+    'dump/plwn': lambda: _dump('.plwn'),
+}
+
+# Features some benchmarks need, which older checkouts do not have
+REQUIRES = {
+    'load/plwn': 'snapshot',
+    'load/plwn-mmap': 'snapshot',
+    'dump/plwn': 'snapshot',
+    'traversal/neighbourhood': 'traversal',
+    'traversal/shortest-path': 'traversal',
+}
+
+
+def _has(feature):
+    import importlib.util
+    if feature == 'snapshot': return importlib.util.find_spec('plwordnet.snapshot') is not None
+    from plwordnet.wordnet import Wordnet
+    return hasattr(Wordnet, 'synset_traversal')
+
+
+def child(argv):
+    import gc
+    import resource
+    import time
+
+    def peak_rss():
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024
+
+    name, files, repeat = argv[0], json.loads(argv[1]), int(argv[2])
+    if name == 'prepare':
+        return prepare(files)
+    if name == 'prepare-tree':
+        return prepare_tree(files)
+    if name in REQUIRES and not _has(REQUIRES[name]):
+        print(json.dumps({'unsupported': f'no {REQUIRES[name]} support'}))
+        return
+    setup, body = BENCHMARKS[name]()
+    times, growth = [], None
+    for _ in range(repeat):
+        state = setup(files)
+        gc.collect()
+        before = peak_rss()
+        start = time.perf_counter()
+        ops = body(state)
+        times.append(time.perf_counter() - start)
+        # The peak never goes down, so only the first run shows how much the body adds to it
+        if growth is None: growth = peak_rss() - before
+        del state
+    print(json.dumps({'times': times, 'ops': ops, 'peak_growth': growth}))
+
+
+def prepare(files):
+    # Writes the files shared by all checkouts
+    import importlib
+    import shutil
+    if 'synthetic' in files and not os.path.exists(files['xml']):
+        import generate
+        with generate.open_text(files['xml']) as f: generate.Generator(files['synthetic']).write(f)
+    for ext, module in FORMATS.items():
+        if os.path.exists(files[ext]): continue
+        with open(files['xml'], 'rb') as src, importlib.import_module(module).open(files[ext], 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+    print('{}')
+
+
+def prepare_tree(files):
+    # Writes the pickle, and the snapshot if supported, with the benchmarked checkout
+    import plwordnet
+    snapshot = _has('snapshot')
+    if not os.path.exists(files['pkl']) or snapshot and not os.path.exists(files['plwn']):
+        wn = plwordnet.load(files['xml'])
+        wn.dump(files['pkl'])
+        if snapshot: wn.dump(files['plwn'])
+    print('{}')
+
+
+def run(tree, name, files, repeat):
+    args = [sys.executable, '-c', CHILD, name, json.dumps(files), str(repeat)]
+    proc = subprocess.run(args, cwd=tree, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if proc.returncode != 0:
+        return {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f'exit status {proc.returncode}'}
+    return json.loads(proc.stdout.splitlines()[-1])
+
+
+def _head(tree):
+    # The commit of a checkout, or None if it is not a git repository
+    proc = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=tree, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                          universal_newlines=True)
+    return proc.stdout.strip() if proc.returncode == 0 else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('src', nargs='?', help='path to an uncompressed wordnet XML file')
+    parser.add_argument('--synthetic', type=int, metavar='SYNSETS', help='use a generated wordnet XML file of this many synsets instead')
+    parser.add_argument('--workdir', help='directory for the derived files, kept between runs (temporary by default)')
+    parser.add_argument('--tree', default=ROOT, help='checkout of this repository to benchmark')
+    parser.add_argument('--only', nargs='+', default=[], metavar='PREFIX', help='run only benchmarks with these name prefixes')
+    parser.add_argument('-n', '--repeat', type=int, default=3, help='number of timed runs of every benchmark')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='compare times with results written by --json')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown reported as a regression')
+    args = parser.parse_args()
+    if (args.src is None) == (args.synthetic is None): parser.error('Expected either a path or --synthetic')
+
+    names = [x for x in BENCHMARKS if not args.only or any(x.startswith(p) for p in args.only)]
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = os.path.abspath(args.workdir or tmp)
+        os.makedirs(workdir, exist_ok=True)
+        base = os.path.join(workdir, 'wordnet')
+        if args.synthetic is not None: base = os.path.join(workdir, f'synthetic-{args.synthetic}')
+        src = os.path.abspath(args.src) if args.src else f'{base}.xml'
+        tree = os.path.abspath(args.tree)
+        # Pickles and snapshots of every checkout and commit are kept apart
+        key = hashlib.sha1(f'{tree} {_head(tree)}'.encode()).hexdigest()[:10]
+        files = dict(xml=src, dir=workdir, pkl=f'{base}-{key}.pkl', plwn=f'{base}-{key}.plwn',
+                     **{ext: f'{base}.xml.{ext}' for ext in FORMATS})
+        if args.synthetic is not None: files['synthetic'] = args.synthetic
+        for checkout, step in ((ROOT, 'prepare'), (tree, 'prepare-tree')):
+            prepared = run(checkout, step, files, 1)
+            if 'error' in prepared: sys.exit(f'Preparing files failed: {prepared["error"]}')
+
+        baseline = json.load(open(args.compare))['results'] if args.compare else {}
+        results, regressions = dict(), []
+        print(f'{"benchmark":32} {"best [s]":>10} {"median [s]":>11} {"per op [us]":>12} {"peak RSS growth [MiB]":>22} {"change":>8}')
+        for name in names:
+            res = results[name] = run(tree, name, files, args.repeat)
+            if 'unsupported' in res:
+                print(f'{name:32} unsupported: {res["unsupported"]}')
+                continue
+            if 'error' in res:
+                print(f'{name:32} failed: {res["error"]}')
+                continue
+            best, median = min(res['times']), statistics.median(res['times'])
+            res.update(best=best, median=median)
+            change = ''
+            if name in baseline and 'best' in baseline[name]:
+                ratio = best / baseline[name]['best'] - 1
+                change = f'{ratio:+8.1%}'
+                if ratio > args.threshold and best - baseline[name]['best'] > NOISE: regressions.append(name)
+            print(f'{name:32} {best:10.3f} {median:11.3f} {best / res["ops"] * 1e6:12.1f} '
+                  f'{res["peak_growth"] / 2**20:22.1f} {change:>8}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'src': src, 'python': sys.version.split()[0], 'results': results}, f, indent=1)
+    if regressions:
+        print(f'Slower by more than {args.threshold:.0%}: {", ".join(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Check and measure the traversals of `plwordnet.traversal`.
+
+`Traversal.dfs` must yield the same nodes as `Traversal.bfs`, with and without `max_depth`, and
+`neighbourhood` and `shortest_path_length` must agree with the depths of `bfs`. This is checked
+on a small graph where the first branch reaches a node later than the shortest route does,
+on random graphs, and on random synsets of a wordnet in every direction. Then `bfs`, `dfs` and
+`shortest_path` are timed on the wordnet.
+
+    python benchmarks/traversal.py plwordnet_4_2.plwn
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from array import array
+
+# `python benchmarks/...` puts this directory on the path, but not the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import plwordnet
+from plwordnet.graph import Relations
+from plwordnet.traversal import DIRECTIONS, Traversal
+
+
+# 6 is three steps from 1 through 3, but the first branch (1, 2, 4) reaches 5 at depth 3
+EXAMPLE = [(1, 2), (1, 3), (2, 4), (4, 5), (3, 5), (5, 6)]
+
+
+def relations(edges):
+    return Relations(array('i', (a for a, _ in edges)), array('i', [0] * len(edges)), array('i', (b for _, b in edges)))
+
+
+def random_edges(nodes, edges, rnd):
+    return [(rnd.randrange(nodes), rnd.randrange(nodes)) for _ in range(edges)]
+
+
+def check(traversal, start, max_depth):
+    depths = dict(traversal.bfs(start, max_depth))
+    found = [id for id, _ in traversal.dfs(start, max_depth)]
+    assert len(found) == len(set(found)), f'dfs({start}, {max_depth}) yielded a node twice'
+    assert set(found) == set(depths), f'dfs({start}, {max_depth}) found {sorted(found)}, bfs found {sorted(depths)}'
+    if max_depth is not None:
+        assert all(depth <= max_depth for _, depth in traversal.dfs(start, max_depth))
+        assert traversal.neighbourhood(start, max_depth) == depths
+    for id, depth in list(depths.items())[:20]:
+        assert traversal.shortest_path_length(start, id) == depth, f'Distance from {start} to {id} is not {depth}'
+
+
+def timed(f, starts):
+    start = time.perf_counter()
+    for x in starts: f(x)
+    return (time.perf_counter() - start) / len(starts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('src', help='path to the wordnet file passed to `plwordnet.load`')
+    parser.add_argument('--graphs', type=int, default=1000, help='number of random graphs to check')
+    parser.add_argument('--starts', type=int, default=200, help='number of random synsets to check and time')
+    args = parser.parse_args()
+    rnd = random.Random(0)
+
+    example = Traversal(relations(EXAMPLE))
+    assert dict(example.dfs(1, 3)).keys() == {1, 2, 3, 4, 5, 6}
+    for max_depth in (None, 0, 1, 2, 3):
+        check(example, 1, max_depth)
+    for _ in range(args.graphs):
+        nodes = rnd.randint(1, 30)
+        graph = relations(random_edges(nodes, rnd.randint(0, 3 * nodes), rnd))
+        for direction in DIRECTIONS:
+            traversal = Traversal(graph, direction=direction)
+            for max_depth in (None, 0, 1, 2, 3, 5):
+                check(traversal, rnd.randrange(nodes), max_depth)
+    print(f'checked {args.graphs} random graphs')
+
+    wn = plwordnet.load(args.src, mmap=True) if args.src.endswith('.plwn') else plwordnet.load(args.src)
+    starts = [rnd.choice(list(wn.synsets)) for _ in range(args.starts)]
+    for direction in DIRECTIONS:
+        traversal = wn.synset_traversal(direction=direction)
+        for x in starts:
+            for max_depth in (1, 3):
+                check(traversal, x, max_depth)
+    print(f'checked {args.starts} synsets')
+
+    traversal = wn.synset_traversal(direction='both')
+    print(f'{"method":24} {"time [ms]":>10}')
+    for name, f in [('bfs, 3 steps', lambda x: list(traversal.bfs(x, 3))),
+                    ('dfs, 3 steps', lambda x: list(traversal.dfs(x, 3))),
+                    ('shortest_path', lambda x: traversal.shortest_path(x, starts[0]))]:
+        print(f'{name:24} {timed(f, starts) * 1000:10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""Annotating tokenized documents with lexical units, synsets, domains and sentiment.
+
+Every document is a list of tokens (or a dict with `tokens` and an optional `id`). Multi-word
+lemmas are matched first (see `plwordnet/mwe.py`), and the remaining tokens are looked up with
+`Wordnet.find_form`, so inflected forms are found if the wordnet has a morphology index. Each
+match becomes an annotation:
+
+    {"start": 3, "end": 5, "units": [...], "synsets": [...], "domains": ["zj"], "polarity": [-2]}
+
+where `start` and `end` are token positions, `domains` are codes of `plwordnet.DOMAINS`, and
+`polarity` are the distinct polarities of the units' emotional annotations.
+
+With `workers`, chunks of `chunk_size` documents are annotated by a process pool. Workers share
+one read-only wordnet: a loaded `Wordnet` is inherited by forked workers without copying, and a
+path to a snapshot is memory-mapped by every worker, which shares its pages with the others.
+Results are yielded in the order of the input, and only a few chunks per worker are in flight,
+so documents can be streamed from and to files of any size.
+
+    python -m plwordnet.annotate plwordnet_4_2.plwn documents.jsonl annotated.jsonl --workers 8
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+
+from .wordnet import Wordnet, load
+
+CHUNK_SIZE = 256
+TOKEN_CACHE_SIZE = 1 << 16
+
+# Annotator of the current worker process
+_annotator = None
+
+
+class Annotator:
+    def __init__(self, wn, min_tokens=2):
+        self.wn = wn
+        self.matcher = wn.mwe_matcher(min_tokens)
+        # Token frequencies are skewed, so most lookups of single tokens are cached
+        self.lookup = lru_cache(maxsize=TOKEN_CACHE_SIZE)(self._lookup)
+
+    def document(self, tokens):
+        """Returns the annotations of a list of tokens, ordered by position."""
+        res, i = [], 0
+        for (start, end), ids in self.matcher.matches(tokens):
+            for j in range(i, start):
+                self._token(res, tokens, j)
+            res.append(self._annotation(start, end, ids))
+            i = end
+        for j in range(i, len(tokens)):
+            self._token(res, tokens, j)
+        return res
+
+    def _token(self, res, tokens, i):
+        found = self.lookup(tokens[i])
+        if found is not None:
+            res.append(dict(start=i, end=i+1, **found))
+
+    def _lookup(self, token):
+        ids = tuple(lu.id for lu in self.wn.find_form(token))
+        if not ids: return None
+        annotation = self._annotation(0, 1, ids)
+        del annotation['start'], annotation['end']
+        return annotation
+
+    def _annotation(self, start, end, ids):
+        lus = [self.wn.lexical_units[id] for id in ids]
+        synsets = sorted({lu.synset.id for lu in lus if lu.synset is not None})
+        domains = sorted({lu.domain for lu in lus if lu.domain})
+        polarity = sorted({x.polarity for lu in lus for x in lu.sentiment if x.polarity is not None})
+        return dict(start=start, end=end, units=list(ids), synsets=synsets, domains=domains, polarity=polarity)
+
+
+def annotate(wn, documents, *, workers=None, chunk_size=CHUNK_SIZE, min_tokens=2):
+    """Yields {"id", "tokens", "annotations"} records of documents in their order.
+
+    `wn` is a `Wordnet` or a path passed to `plwordnet.load` in every worker (memory-mapped if it
+    is a snapshot). Documents without an `id` are numbered from 0.
+    """
+    documents = _documents(documents)
+    if workers is None:
+        annotator = _new_annotator(wn, min_tokens)
+        for id, tokens in documents:
+            yield _record(annotator, id, tokens)
+        return
+
+    assert workers > 0, 'Argument `workers` must be a positive number of processes'
+    if isinstance(wn, Wordnet) and 'fork' in multiprocessing.get_all_start_methods():
+        # Forked workers inherit the wordnet, and the matcher built once here
+        wn.mwe_matcher(min_tokens)
+        with _forked_pool(workers, wn, min_tokens) as pool:
+            yield from _annotate_chunks(pool, documents, workers, chunk_size)
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init, initargs=(wn, min_tokens)) as pool:
+            yield from _annotate_chunks(pool, documents, workers, chunk_size)
+
+
+def write_jsonl(records, file):
+    """Writes records as JSON lines to a text file, and returns the numbers of documents and tokens."""
+    documents = tokens = 0
+    for record in records:
+        file.write(json.dumps(record, ensure_ascii=False))
+        file.write('\n')
+        documents += 1
+        tokens += record['tokens']
+    return documents, tokens
+
+
+def write_arrow(records, file, batch_size=CHUNK_SIZE * 16):
+    """Writes records to an Arrow IPC file (path or binary file object), and returns the numbers of documents and tokens.
+
+    Requires `pyarrow`. Ids are written as strings.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError('Writing Arrow files requires pyarrow (pip install plwordnet[arrow])') from None
+    annotation = pa.struct([
+        ('start', pa.int32()), ('end', pa.int32()), ('units', pa.list_(pa.int32())), ('synsets', pa.list_(pa.int32())),
+        ('domains', pa.list_(pa.string())), ('polarity', pa.list_(pa.int8())),
+    ])
+    schema = pa.schema([('id', pa.string()), ('tokens', pa.int32()), ('annotations', pa.list_(annotation))])
+    documents = tokens = 0
+    records = iter(records)
+    with pa.ipc.new_file(file, schema) as writer:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch: break
+            for record in batch:
+                record['id'] = str(record['id'])
+                tokens += record['tokens']
+            documents += len(batch)
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+    return documents, tokens
+
+
+def _documents(documents):
+    for i, doc in enumerate(documents):
+        if isinstance(doc, dict):
+            yield doc.get('id', i), doc['tokens']
+        else:
+            yield i, doc
+
+
+def _record(annotator, id, tokens):
+    return dict(id=id, tokens=len(tokens), annotations=annotator.document(tokens))
+
+
+def _new_annotator(wn, min_tokens):
+    if isinstance(wn, str):
+        wn = load(wn, mmap=True) if wn.endswith('.plwn') else load(wn)
+    return Annotator(wn, min_tokens)
+
+
+def _init(wn, min_tokens):
+    global _annotator
+    _annotator = _new_annotator(wn, min_tokens)
+
+
+def _annotate_chunk(chunk):
+    return [_record(_annotator, id, tokens) for id, tokens in chunk]
+
+
+def _annotate_chunks(pool, documents, workers, chunk_size):
+    # A few chunks per worker are in flight, so that workers are not idle while results are written
+    pending = deque()
+    while True:
+        chunk = list(islice(documents, chunk_size))
+        if chunk: pending.append(pool.submit(_annotate_chunk, chunk))
+        if len(pending) >= 2 * workers or not chunk and pending:
+            yield from pending.popleft().result()
+        if not chunk and not pending: break
+
+
+def _forked_pool(workers, wn, min_tokens):
+    global _annotator
+    # The annotator is set only while the workers are forked, which happens when the pool starts
+    _annotator = Annotator(wn, min_tokens)
+    try:
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+        list(pool.map(_ready, range(workers)))
+    finally:
+        _annotator = None
+    return pool
+
+
+def _ready(_):
+    return _annotator is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('wordnet', help='path to the wordnet file passed to `plwordnet.load` (a snapshot is memory-mapped)')
+    parser.add_argument('src', help='JSON lines file with a list of tokens, or an object with `tokens` and `id` on each line')
+    parser.add_argument('dst', help='output file, JSON lines, or Arrow IPC if it ends with .arrow')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='number of documents sent to a worker at once')
+    parser.add_argument('--min-tokens', type=int, default=2, help='shortest lemma matched as a multi-word expression')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    wn = args.wordnet if args.workers is not None and args.wordnet.endswith('.plwn') else load(args.wordnet)
+    loaded = time.perf_counter()
+    with open(args.src, encoding='utf-8') as src:
+        documents = (json.loads(line) for line in src if line.strip())
+        records = annotate(wn, documents, workers=args.workers, chunk_size=args.chunk_size, min_tokens=args.min_tokens)
+        if args.dst.endswith('.arrow'):
+            documents, tokens = write_arrow(records, args.dst)
+        else:
+            with open(args.dst, 'w', encoding='utf-8') as dst:
+                documents, tokens = write_jsonl(records, dst)
+    elapsed = time.perf_counter() - loaded
+    print(f'loaded the wordnet in {loaded - start:.1f}s', file=sys.stderr)
+    print(f'annotated {documents} documents, {tokens} tokens in {elapsed:.1f}s '
+          f'({tokens / max(elapsed, 1e-9):.0f} tokens/s)', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
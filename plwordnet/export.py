@@ -0,0 +1,160 @@
+"""Export of the synset and lexical unit graphs for graph libraries.
+
+`Graph` holds the relations between a selection of nodes (synsets or lexical units, optionally
+restricted to a part of speech and a language) as columns of an edge list: the rows of the
+subject and object of every edge, and its relation type id. Row `i` stands for the node with
+id `ids[i]`, and rows are numbered in the order of ids. The edges are read from the subject
+order of `Relations`, so they come sorted by source row, and `indptr` (the offsets of the
+edges of each source row) makes them a CSR adjacency matrix without sorting or copying.
+
+All columns are `array.array`s. `matrix` and `matrices` wrap them with `numpy.frombuffer` into
+`scipy.sparse.csr_matrix` objects, and `save` writes them as NPZ, Parquet or raw binary edge
+lists. NumPy, SciPy and pyarrow are only imported by the methods which need them.
+
+    graph = wn.synset_graph(['hiperonimia', 'meronimia'], pos='NOUN', language='pl')
+    adjacency = graph.matrix()
+    graph.save('edges.parquet')
+"""
+
+import sys
+from array import array
+from dataclasses import dataclass
+
+from .display import POS_STR
+from .traversal import relation_ids
+
+FORMATS = 'npz parquet bin'.split()
+
+
+@dataclass
+class Graph:
+    __slots__ = 'ids indptr sources targets relations'.split()
+    ids: array
+    indptr: array
+    sources: array
+    targets: array
+    relations: array
+
+    def __len__(self):
+        return len(self.sources)
+
+    @property
+    def shape(self):
+        return len(self.ids), len(self.ids)
+
+    def rows(self):
+        """Returns a dict from node ids to their rows."""
+        return {id: i for i, id in enumerate(self.ids)}
+
+    def matrix(self, relation=None, *, typed=False, dtype='float32'):
+        """Returns the adjacency matrix as `scipy.sparse.csr_matrix`, of all edges or of one relation type id.
+
+        Edges of several relation types between two nodes are kept as separate entries, which
+        SciPy adds up when they are summed or converted. With `typed`, the entries are relation
+        type ids (int32) instead of ones of `dtype`.
+        """
+        np, sparse = _numpy(), _scipy()
+        indptr, targets, relations = (np.frombuffer(x, dtype=np.int32) for x in (self.indptr, self.targets, self.relations))
+        if relation is not None:
+            keep = relations == relation
+            counts = np.bincount(np.frombuffer(self.sources, dtype=np.int32)[keep], minlength=len(self.ids))
+            indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int32)
+            targets, relations = targets[keep], relations[keep]
+        data = relations.copy() if typed else np.ones(len(targets), dtype=dtype)
+        return sparse.csr_matrix((data, targets, indptr), shape=self.shape)
+
+    def matrices(self, *, dtype='float32'):
+        """Returns a dict from relation type ids to the adjacency matrices of their edges."""
+        return {rel: self.matrix(rel, dtype=dtype) for rel in sorted(set(self.relations))}
+
+    def save(self, file, format=None):
+        """Writes the edges to a path or binary file, in `format` given or taken from the path extension.
+
+        `npz` stores the `ids`, `sources`, `targets` and `relations` arrays, `parquet` a table of
+        `source`, `target` (rows), `subject`, `object` (ids) and `relation` columns, and `bin`
+        (subject id, object id, relation id) triples of little-endian int32.
+        """
+        if format is None:
+            assert isinstance(file, str), 'Argument `format` is required when writing to a file object'
+            format = file.rsplit('.', 1)[-1]
+        assert format in FORMATS, f'Argument `format` must be one of {FORMATS}'
+        if format == 'npz':
+            np = _numpy()
+            columns = {x: np.frombuffer(getattr(self, x), dtype=np.int32) for x in 'ids sources targets relations'.split()}
+            np.savez(file, **columns)
+        elif format == 'parquet':
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError('Writing Parquet files requires pyarrow (pip install plwordnet[arrow])') from None
+            subjects, objects = self._ids(self.sources), self._ids(self.targets)
+            columns = dict(source=self.sources, target=self.targets, subject=subjects, object=objects, relation=self.relations)
+            pq.write_table(pa.table({k: pa.array(v, type=pa.int32()) for k, v in columns.items()}), file)
+        else:
+            triples = array('i', bytes(12 * len(self)))
+            triples[0::3], triples[1::3], triples[2::3] = self._ids(self.sources), self._ids(self.targets), self.relations
+            if sys.byteorder == 'big': triples.byteswap()
+            if isinstance(file, str):
+                with open(file, 'wb') as f: triples.tofile(f)
+            else:
+                file.write(triples.tobytes())
+
+    def _ids(self, rows):
+        return array('i', map(self.ids.__getitem__, rows))
+
+
+def graph(wn, kind, relations=None, *, pos=None, language=None):
+    """Returns the `Graph` of `kind` ('synset' or 'lexical') of `wn`, with the given nodes and relation types.
+
+    `relations` are given like to `relation_ids`, `pos` is a Polish (`przymiotnik`) or short
+    English (`ADJ`) part of speech, and `language` is `pl` or `en`. Nodes are kept even if
+    they have no edges.
+    """
+    assert kind in ('synset', 'lexical'), "Argument `kind` must be 'synset' or 'lexical'"
+    store = wn.synset_relations if kind == 'synset' else wn.lexical_relations
+    table = wn.synsets if kind == 'synset' else wn.lexical_units
+    if pos is None and language is None:
+        ids = sorted(table)
+    else:
+        ids = sorted(id for id, pos_pl in wn._node_pos(kind) if _matches(pos_pl, pos, language))
+    ids = array('i', ids)
+    rows = {id: i for i, id in enumerate(ids)}
+    predicates = relation_ids(wn, relations)
+
+    indptr, sources, targets, rels = array('i', bytes(4 * (len(ids) + 1))), array('i'), array('i'), array('i')
+    subjects, objects, order = store.columns['s'], store.columns['o'], store.groups['s'][2]
+    # Triples in the subject order have ascending subjects, and so ascending source rows
+    for s, p, o in zip(map(subjects.__getitem__, order), store.composite['s'], map(objects.__getitem__, order)):
+        if predicates is not None and p not in predicates: continue
+        a, b = rows.get(s), rows.get(o)
+        if a is None or b is None: continue
+        sources.append(a)
+        targets.append(b)
+        rels.append(p)
+        indptr[a+1] += 1
+    for i in range(len(ids)):
+        indptr[i+1] += indptr[i]
+    return Graph(ids=ids, indptr=indptr, sources=sources, targets=targets, relations=rels)
+
+
+def _matches(pos_pl, pos, language):
+    if pos_pl is None: return False
+    if pos is not None and pos != pos_pl and pos != POS_STR[pos_pl]: return False
+    return language is None or language == ('en' if pos_pl.endswith(' pwn') else 'pl')
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('Exporting arrays requires numpy (pip install plwordnet[scipy])') from None
+    return numpy
+
+
+def _scipy():
+    try:
+        from scipy import sparse
+    except ImportError:
+        raise ImportError('Exporting matrices requires scipy (pip install plwordnet[scipy])') from None
+    return sparse
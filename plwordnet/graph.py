@@ -0,0 +1,215 @@
+"""Compact storage for relation triples.
+
+`Relations` keeps (subject, predicate, object) triples in three typed integer columns. For each
+of the three fields it also keeps a compressed sparse row (CSR) index: the distinct values of
+the field in ascending order (`keys`), the positions of all triples sorted by that field
+(`order`), and for the i-th key the range `offsets[i]:offsets[i+1]` of `order` holding the
+triples with that value.
+
+Within the range of a subject or an object, positions are further sorted by predicate, and
+the predicates are stored in that order as well (`composite`). This makes up composite
+(subject, predicate) and (object, predicate) indexes: the triples matching such a pair are
+found with two binary searches in the range of the subject or the object.
+
+Every triple costs 12 bytes in the columns, 12 bytes in the three `order` arrays and 8 bytes
+in the two `composite` arrays, plus 12 bytes per distinct subject, predicate and object. The
+`list` of 3-tuples with three `defaultdict(set)` indexes used before took roughly 300 bytes
+per triple on 64-bit CPython:
+a tuple (64), its three int objects (84), a list slot (8), and an entry in each of the three
+sets (3 x ~50, together with the position int object).
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from itertools import accumulate
+
+
+@dataclass
+class RelationBatch:
+    """Relations of many nodes at once, as columns of ids.
+
+    Triples matching the i-th queried node are at `offsets[i]:offsets[i+1]` of the other
+    columns. All columns are `array.array`s, so they can be wrapped without copying, for
+    example with `numpy.frombuffer(batch.objects, dtype=numpy.int32)`.
+    """
+    __slots__ = 'offsets positions subjects predicates objects'.split()
+    offsets: array
+    positions: array
+    subjects: array
+    predicates: array
+    objects: array
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+class Relations(Sequence):
+    """Sequence of (subject, predicate, object) id triples, indexed by each of the fields."""
+
+    __slots__ = 'columns groups composite _views'.split()
+
+    def __init__(self, subjects=(), predicates=(), objects=(), groups=None, composite=None):
+        if not all(isinstance(x, (array, memoryview)) for x in (subjects, predicates, objects)):
+            subjects, predicates, objects = (array('i', x) for x in (subjects, predicates, objects))
+        assert len(subjects) == len(predicates) == len(objects), 'Columns must have equal lengths'
+        self.columns = dict(s=subjects, p=predicates, o=objects)
+        # groups[field] are the (keys, offsets, order) arrays of the field, and composite[field]
+        # are the predicates of triples in the subject and object orders
+        if groups is None:
+            groups = dict(p=_group(predicates, range(len(predicates))))
+            by_predicate = groups['p'][2]
+            groups['s'] = _group(subjects, by_predicate)
+            groups['o'] = _group(objects, by_predicate)
+        if composite is None:
+            composite = {x: array('i', map(predicates.__getitem__, groups[x][2])) for x in 'so'}
+        self.groups, self.composite = groups, composite
+        self._views = dict()
+
+    @classmethod
+    def from_triples(cls, triples):
+        columns = array('i'), array('i'), array('i')
+        for triple in triples:
+            for column, x in zip(columns, triple):
+                column.append(x)
+        return cls(*columns)
+
+    @property
+    def subjects(self):
+        return self.columns['s']
+
+    @property
+    def predicates(self):
+        return self.columns['p']
+
+    @property
+    def objects(self):
+        return self.columns['o']
+
+    def __len__(self):
+        return len(self.columns['s'])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self.columns['s'][i], self.columns['p'][i], self.columns['o'][i]
+
+    def group(self, field, key):
+        """Returns positions of triples, where `field` ('s', 'p' or 'o') is equal to `key`."""
+        lo, hi = self._range(field, key)
+        return self.groups[field][2][lo:hi]
+
+    def where(self, s=None, p=None, o=None):
+        """Returns positions of triples which match all fields that are not `None`.
+
+        The bound fields select candidate ranges of the subject, object, predicate, and
+        (subject, predicate) or (object, predicate) indexes. Only the smallest of them is read,
+        and the triples in it are checked against any fields it does not cover.
+        """
+        best = None
+        for field, key in (('s', s), ('o', o)):
+            if key is None: continue
+            lo, hi = self._range(field, key)
+            if p is not None:
+                predicates = self.composite[field]
+                lo, hi = bisect_left(predicates, p, lo, hi), bisect_right(predicates, p, lo, hi)
+            if best is None or hi - lo < best[2] - best[1]:
+                best = field, lo, hi
+        if best is None:
+            best = ('p',) + self._range('p', p)
+        field, lo, hi = best
+        found = self.groups[field][2][lo:hi]
+        if field == 's' and o is not None:
+            column = self.columns['o']
+            found = [i for i in found if column[i] == o]
+        elif field == 'o' and s is not None:
+            column = self.columns['s']
+            found = [i for i in found if column[i] == s]
+        return found
+
+    def batch(self, field, ids, predicates=None):
+        """Returns a `RelationBatch` of triples, where `field` ('s' or 'o') is equal to each of `ids`.
+
+        If `predicates` is given, only triples with one of these predicate ids are returned.
+        """
+        assert field in ('s', 'o'), 'Batches can only be selected by subject or object'
+        keys, offsets, order = self.groups[field]
+        order, composite, n = memoryview(order), self.composite[field], len(keys)
+        predicates = None if predicates is None else sorted(set(predicates))
+        bounds, positions = array('q', [0]), array('i')
+        for id in ids:
+            i = bisect_left(keys, id)
+            if i < n and keys[i] == id:
+                lo, hi = offsets[i], offsets[i+1]
+                if predicates is None:
+                    positions.frombytes(order[lo:hi].cast('B'))
+                else:
+                    for p in predicates:
+                        a = bisect_left(composite, p, lo, hi)
+                        b = bisect_right(composite, p, a, hi)
+                        if a < b: positions.frombytes(order[a:b].cast('B'))
+            bounds.append(len(positions))
+        s, p, o = (array('i', map(self.columns[x].__getitem__, positions)) for x in 'spo')
+        return RelationBatch(offsets=bounds, positions=positions, subjects=s, predicates=p, objects=o)
+
+    def _range(self, field, key):
+        # Returns the range of `order` of the field, which holds positions of triples with the key
+        keys, offsets, _ = self.groups[field]
+        i = _find(keys, key)
+        if i is None: return 0, 0
+        return offsets[i], offsets[i+1]
+
+    def index(self, field):
+        """Returns a read-only mapping from values of `field` to sets of positions.
+
+        The mapping stands in for the `defaultdict(set)` indexes kept by older versions.
+        """
+        view = self._views.get(field)
+        if view is None:
+            view = self._views[field] = _GroupIndex(*self.groups[field])
+        return view
+
+    def __reduce__(self):
+        columns = tuple(array(x.format, x) if isinstance(x, memoryview) else x for x in self.columns.values())
+        return Relations, columns
+
+    def __repr__(self):
+        return f'<Relations: {len(self)} triples>'
+
+
+class _GroupIndex(Mapping):
+    __slots__ = 'keys offsets order'.split()
+
+    def __init__(self, keys, offsets, order):
+        self.keys, self.offsets, self.order = keys, offsets, order
+
+    def __getitem__(self, key):
+        i = _find(self.keys, key)
+        if i is None: return set()
+        return set(self.order[self.offsets[i]:self.offsets[i+1]])
+
+    def __contains__(self, key):
+        return _find(self.keys, key) is not None
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def _group(column, positions):
+    # Sorting is stable, so positions with equal values stay in the order they were given in
+    counts = Counter(column)
+    keys = array('i', sorted(counts))
+    offsets = array('q', [0])
+    offsets.extend(accumulate(counts[x] for x in keys))
+    order = array('i', sorted(positions, key=column.__getitem__))
+    return keys, offsets, order
+
+
+def _find(keys, key):
+    i = bisect_left(keys, key)
+    return i if i < len(keys) and keys[i] == key else None
@@ -0,0 +1,168 @@
+"""Memoized hypernym hierarchy of synsets.
+
+`Hierarchy` answers questions about the graph formed by a set of hypernym relations: direct
+hypernyms, ancestors, depth and roots of a synset, and hypernym paths. Everything is computed
+lazily, the first time a synset (or one of its hyponyms) is asked about, and then memoized.
+
+Hypernym cycles are collapsed into strongly connected components, which are found with an
+iterative version of Tarjan's algorithm. Depths and roots are defined on the resulting
+acyclic graph of components, so all members of a cycle have the same depth and are their own
+ancestors.
+"""
+
+
+class Hierarchy:
+    def __init__(self, wn, relations):
+        self.wn = wn
+        self.relations = [rel.id for rel in relations]
+        self._hypernyms = dict()
+        self._component = dict()
+        # The following lists are indexed by component number
+        self._members = []
+        self._min_depth = []
+        self._max_depth = []
+        self._roots = []
+        self._reaches_cycle = []
+        self._ancestors = dict()
+
+    def hypernyms(self, id):
+        """Returns ids of the direct hypernyms of synset `id`, in the order of `Wordnet.hypernyms`."""
+        res = self._hypernyms.get(id)
+        if res is None:
+            rels = self.wn.synset_relations
+            subjects = rels.subjects
+            res = self._hypernyms[id] = tuple(subjects[i] for p in self.relations for i in rels.where(p=p, o=id))
+        return res
+
+    def ancestors(self, id):
+        """Returns a frozenset of ids of all direct and indirect hypernyms of synset `id`."""
+        c = self.component(id)
+        res = self._ancestors.get(c)
+        if res is None:
+            found, todo = set(), list(self._members[c])
+            while todo:
+                for h in self.hypernyms(todo.pop()):
+                    if h not in found:
+                        found.add(h)
+                        todo.append(h)
+            res = self._ancestors[c] = frozenset(found)
+        return res
+
+    def is_a(self, id, hypernym):
+        """Returns whether synset `hypernym` is a direct or indirect hypernym of synset `id`."""
+        if id == hypernym:
+            return self.in_cycle(id)
+        c, h = self.component(id), self.component(hypernym)
+        if c == h:
+            return True
+        # Every ancestor in another component is at least one level closer to the roots
+        if self._max_depth[c] <= self._min_depth[h]:
+            return False
+        return hypernym in self.ancestors(id)
+
+    def min_depth(self, id):
+        """Returns the length of the shortest hypernym path from synset `id` to a root."""
+        return self._min_depth[self.component(id)]
+
+    def max_depth(self, id):
+        """Returns the length of the longest hypernym path from synset `id` to a root."""
+        return self._max_depth[self.component(id)]
+
+    def roots(self, id):
+        """Returns a frozenset of ids of the root synsets, which synset `id` descends from."""
+        return self._roots[self.component(id)]
+
+    def in_cycle(self, id):
+        """Returns whether synset `id` is its own (direct or indirect) hypernym."""
+        members = self._members[self.component(id)]
+        return len(members) > 1 or id in self.hypernyms(id)
+
+    def reaches_cycle(self, id):
+        """Returns whether a hypernym cycle can be reached from synset `id`."""
+        return self._reaches_cycle[self.component(id)]
+
+    def paths(self, id, full_search=False):
+        """Returns hypernym paths of synset `id` as lists of ids, like `Wordnet.hypernym_paths`.
+
+        Synsets, from which a hypernym cycle can be reached, are not supported.
+        """
+        assert not self.reaches_cycle(id), 'Hypernym paths through cycles must be found with Wordnet.hypernym_paths'
+        res, path = [], []
+        stack = [iter(self._next(id, full_search))]
+        while stack:
+            hypernym = next(stack[-1], None)
+            if hypernym is None:
+                stack.pop()
+                if path: path.pop()
+                continue
+            path.append(hypernym)
+            hypernyms = self._next(hypernym, full_search)
+            if hypernyms:
+                stack.append(iter(hypernyms))
+            else:
+                res.append(list(path))
+                path.pop()
+        return res
+
+    def _next(self, id, full_search):
+        hypernyms = self.hypernyms(id)
+        return hypernyms if full_search else hypernyms[:1]
+
+    def component(self, id):
+        """Returns the number of the strongly connected component of synset `id`."""
+        c = self._component.get(id)
+        if c is None:
+            self._explore(id)
+            c = self._component[id]
+        return c
+
+    def _explore(self, start):
+        # Tarjan's algorithm over ancestors of `start` that were not explored before. Components
+        # are completed in reverse topological order, hypernyms first.
+        index, low, stack, on_stack = {start: 0}, {start: 0}, [start], {start}
+        work = [(start, iter(self.hypernyms(start)))]
+        while work:
+            node, hypernyms = work[-1]
+            for h in hypernyms:
+                if h in self._component:
+                    continue
+                if h not in index:
+                    index[h] = low[h] = len(index)
+                    stack.append(h)
+                    on_stack.add(h)
+                    work.append((h, iter(self.hypernyms(h))))
+                    break
+                if h in on_stack:
+                    low[node] = min(low[node], index[h])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    members = []
+                    while True:
+                        x = stack.pop()
+                        on_stack.discard(x)
+                        members.append(x)
+                        if x == node: break
+                    self._complete(members)
+
+    def _complete(self, members):
+        c = len(self._members)
+        for x in members:
+            self._component[x] = c
+        above = {self._component[h] for x in members for h in self.hypernyms(x)}
+        cyclic = len(members) > 1 or c in above
+        above.discard(c)
+        self._members.append(tuple(members))
+        if above:
+            self._min_depth.append(1 + min(self._min_depth[x] for x in above))
+            self._max_depth.append(1 + max(self._max_depth[x] for x in above))
+            self._roots.append(frozenset().union(*(self._roots[x] for x in above)))
+            self._reaches_cycle.append(cyclic or any(self._reaches_cycle[x] for x in above))
+        else:
+            self._min_depth.append(0)
+            self._max_depth.append(0)
+            self._roots.append(frozenset(members))
+            self._reaches_cycle.append(cyclic)
@@ -0,0 +1,119 @@
+"""Index from inflected word forms to lemmas.
+
+The index is built once from a morphological dictionary in TSV format, like PoliMorf or a dump
+of SGJP, with a word form, its lemma and a morphosyntactic tag on every line:
+
+    lasami	las	subst:pl:inst:m3
+    leśnej	leśny	adj:sg:gen.dat.loc:f:pos
+
+and saved in the container format of snapshots (see `plwordnet/snapshot.py`). It holds the
+distinct lowercase forms sorted as UTF-8 bytes in one blob, and for every form a range of
+(lemma id, part of speech) pairs, with the lemmas in a string table. When the file is loaded
+(memory-mapped by default), only every `BLOCK`-th form is copied into a Python list; a lookup
+bisects that list, and then the block of forms in the mapped file. So the dictionary is never
+held in memory as Python strings, and processes mapping the same file share its pages.
+
+    plwordnet.morphology.build('polimorf.tab', 'polimorf.plwm')
+    wn.morphology = plwordnet.morphology.load('polimorf.plwm')
+    wn.find_form('lasami')
+"""
+
+import csv
+import io
+import mmap as _mmap
+from array import array
+from bisect import bisect_right
+
+from .snapshot import _Strings, _StringTable, _offsets, _read, _write
+
+
+MAGIC = b'PLWNMORF'
+VERSION = 1
+EXTENSION = '.plwm'
+BLOCK = 64
+
+# Parts of speech of lemmas by the first part of the tag, with the values of `LexicalUnit.pos`
+POS = [None, 'NOUN', 'ADJ', 'ADV', 'VERB']
+TAG_POS = {
+    'subst': 1, 'depr': 1,
+    'adj': 2, 'adja': 2, 'adjp': 2, 'adjc': 2,
+    'adv': 3,
+    'fin': 4, 'bedzie': 4, 'praet': 4, 'impt': 4, 'imps': 4, 'inf': 4, 'pcon': 4, 'pant': 4,
+    'ger': 4, 'pact': 4, 'ppas': 4, 'winien': 4,
+}
+
+
+class Morphology:
+    def __init__(self, sections):
+        self.forms = _Strings(sections['form_offsets'], sections['form_data'])
+        self.lemma_strings = _Strings(sections['lemma_offsets'], sections['lemma_data'])
+        self.pair_offsets = sections['pair_offsets']
+        self.pair_lemma = sections['pair_lemma']
+        self.pair_pos = sections['pair_pos']
+        offsets, data = self.forms.offsets, self.forms.data
+        self.sample = [bytes(data[offsets[i]:offsets[i+1]]) for i in range(0, len(self.forms), BLOCK)]
+
+    def __len__(self):
+        return len(self.forms)
+
+    def lemmas(self, form):
+        """Returns (lemma, part of speech) pairs of a word form, where the part of speech may be `None`."""
+        i = self._find(form.lower().encode('utf-8'))
+        if i is None: return []
+        lo, hi = self.pair_offsets[i], self.pair_offsets[i+1]
+        return [(self.lemma_strings[self.pair_lemma[j]], POS[self.pair_pos[j]]) for j in range(lo, hi)]
+
+    def _find(self, key):
+        b = bisect_right(self.sample, key) - 1
+        if b < 0: return None
+        offsets, data = self.forms.offsets, self.forms.data
+        lo, hi = b * BLOCK, min(len(self.forms), (b + 1) * BLOCK)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            x = bytes(data[offsets[mid]:offsets[mid+1]])
+            if x < key: lo = mid + 1
+            elif x > key: hi = mid
+            else: return mid
+        return None
+
+
+def build(src, dst):
+    """Builds the index from a TSV file (path or text file object) and saves it to `dst` (path or binary file object)."""
+    if isinstance(src, str):
+        with open(src, encoding='utf-8', newline='') as f:
+            return build(f, dst)
+    if isinstance(dst, str):
+        with open(dst, 'wb') as f:
+            return build(src, f)
+
+    lemmas, pairs = _StringTable(), dict()
+    for row in csv.reader(src, delimiter='\t', quoting=csv.QUOTE_NONE):
+        if len(row) < 2 or not row[0]: continue
+        pos = TAG_POS.get(row[2].split(':', 1)[0], 0) if len(row) > 2 else 0
+        pair = lemmas.add(row[1].lower()) << 3 | pos
+        entry = pairs.setdefault(row[0].lower(), [])
+        if pair not in entry: entry.append(pair)
+
+    forms = sorted((k.encode('utf-8'), v) for k, v in pairs.items())
+    s = dict()
+    s['form_offsets'] = _offsets(len(k) for k, _ in forms)
+    s['form_data'] = b''.join(k for k, _ in forms)
+    s['pair_offsets'] = _offsets(len(v) for _, v in forms)
+    s['pair_lemma'] = array('i', (x >> 3 for _, v in forms for x in v))
+    s['pair_pos'] = array('b', (x & 7 for _, v in forms for x in v))
+    s['lemma_offsets'], s['lemma_data'] = lemmas.finish()
+    _write(dst, s, MAGIC, VERSION)
+
+
+def load(src, *, mmap=True):
+    """Loads the index from a path or a binary file object, memory-mapping files on disk by default."""
+    if isinstance(src, str):
+        with open(src, 'rb') as f:
+            return load(f, mmap=mmap)
+    if mmap:
+        if not isinstance(src, (io.BufferedReader, io.FileIO)):
+            raise ValueError('Only uncompressed morphology files on disk can be memory-mapped')
+        src = _mmap.mmap(src.fileno(), 0, access=_mmap.ACCESS_READ)
+    elif hasattr(src, 'read'):
+        src = src.read()
+    return Morphology(_read(src, MAGIC, VERSION, 'morphology index'))
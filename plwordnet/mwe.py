@@ -0,0 +1,79 @@
+"""Matching multi-word lemmas in token streams.
+
+`Matcher` keeps lemmas split on whitespace in a token trie: nested dicts from a lowercase token
+to the node of the next token, where the key `None` holds the lexical unit ids of the lemma
+ending there. A stream of tokens is scanned in one pass: tokens that do not start any lemma
+cost a single dict lookup, and the others walk the trie for at most `depth` (the number of
+tokens of the longest lemma) tokens. Tokens are read in chunks, so that only the chunk and
+the last `depth` tokens of the previous one are kept in memory, and streams of any size can be
+matched.
+
+    matcher = wn.mwe_matcher()
+    for (start, end), ids in matcher.matches('Wpadł w czarną dziurę'.split()):
+        ...
+"""
+
+from itertools import islice
+
+CHUNK = 1 << 14
+
+
+class Matcher:
+    def __init__(self, names, min_tokens=2):
+        """Builds the trie from (lemma, lexical unit ids) pairs, skipping lemmas with fewer than `min_tokens` tokens."""
+        self.root = dict()
+        self.depth = 0
+        self.count = 0
+        for name, ids in names:
+            tokens = name.lower().split()
+            if len(tokens) < min_tokens or not ids: continue
+            node = self.root
+            for x in tokens:
+                node = node.setdefault(x, dict())
+            node[None] = node.get(None, ()) + tuple(ids)
+            self.depth = max(self.depth, len(tokens))
+            self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def matches(self, tokens, *, longest=True, overlapping=False):
+        """Yields ((start, end), ids) for lemmas found in an iterable of tokens, ordered by `start`.
+
+        `start` and `end` are positions of the first token and the one after the last in the
+        stream, and `ids` is a tuple of lexical unit ids. With `longest`, only the longest lemma
+        starting at a position is yielded, otherwise all of them, shortest first. Without
+        `overlapping`, scanning resumes after the end of the longest lemma found, so matches
+        which start inside it are skipped.
+        """
+        root, depth = self.root, max(self.depth, 1)
+        tokens = iter(tokens)
+        buf, offset, i, done = [], 0, 0, False
+        while not done:
+            chunk = [x.lower() for x in islice(tokens, CHUNK)]
+            done = not chunk
+            # Keep tokens after `i`, which may still be parts of matches
+            buf = buf[i:] + chunk
+            offset += i
+            i = 0
+            # Lemmas starting before `limit` end within the buffer, the others wait for the next chunk
+            limit = len(buf) if done else len(buf) - depth + 1
+            while i < limit:
+                node = root.get(buf[i])
+                if node is None:
+                    i += 1
+                    continue
+                found, j = [], i + 1
+                while True:
+                    ids = node.get(None)
+                    if ids is not None: found.append((j, ids))
+                    if j == len(buf): break
+                    node = node.get(buf[j])
+                    if node is None: break
+                    j += 1
+                if not found:
+                    i += 1
+                    continue
+                for end, ids in found[-1:] if longest else found:
+                    yield (offset + i, offset + end), ids
+                i = i + 1 if overlapping else found[-1][0]
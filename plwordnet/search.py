@@ -0,0 +1,95 @@
+"""Lemma search by prefix, without diacritics, and with typos.
+
+`LemmaIndex` keeps the distinct lemmas of a wordnet, lowercased and with diacritics removed
+("leśny" becomes "lesny"), in one sorted list. Lemmas starting with a prefix are a contiguous
+range of the list, found with two binary searches.
+
+The sorted list is also walked as an implicit trie (the children of a prefix are ranges found
+with binary searches) to find lemmas within an edit distance of a query. A row of the
+Levenshtein table is computed for every visited prefix, and prefixes whose row has no value
+within the distance are not descended into. So no index is needed beyond the sorted list.
+"""
+
+import unicodedata
+from bisect import bisect_left
+
+
+FOLD = str.maketrans('ąćęłńóśźżĄĆĘŁŃÓŚŹŻ', 'acelnoszzACELNOSZZ')
+
+
+def fold(x):
+    """Returns `x` lowercased and without diacritics."""
+    x = x.lower().translate(FOLD)
+    if x.isascii(): return x
+    return ''.join(c for c in unicodedata.normalize('NFD', x) if not unicodedata.combining(c))
+
+
+class LemmaIndex:
+    def __init__(self, names):
+        folded = dict()
+        for name in names:
+            folded.setdefault(fold(name), []).append(name)
+        # keys[i] is a folded lemma, and names[i] are the lowercase lemmas which fold to it
+        self.keys = sorted(folded)
+        self.names = [tuple(sorted(folded[x])) for x in self.keys]
+
+    def exact(self, query):
+        """Yields lowercase lemmas equal to `query`, ignoring diacritics if `query` has none."""
+        key = fold(query)
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            yield from self._names(i, query)
+
+    def prefix(self, query):
+        """Yields lowercase lemmas starting with `query` in alphabetical order, ignoring diacritics if `query` has none."""
+        key = fold(query)
+        lo = bisect_left(self.keys, key)
+        hi = bisect_left(self.keys, key + '\U0010ffff', lo)
+        for i in range(lo, hi):
+            yield from self._names(i, query, prefix=True)
+
+    def fuzzy(self, query, max_distance=1):
+        """Returns (distance, lowercase lemma) pairs within the edit distance of `query`, ignoring diacritics.
+
+        Pairs are sorted by distance and then alphabetically.
+        """
+        q, keys, d = fold(query), self.keys, max_distance
+        n, far = len(q), max_distance + 1
+        found = []
+        stack = [(0, len(keys), 0, [min(j, far) for j in range(n + 1)])]
+        while stack:
+            # Keys in lo:hi share the prefix of length `depth`, and `row` are the distances between
+            # the prefix and each prefix of the query. Only distances up to `d` matter, so cells
+            # further than `d` from the diagonal are not computed, and all are capped at `d + 1`.
+            lo, hi, depth, row = stack.pop()
+            if len(keys[lo]) == depth:
+                if row[n] <= d: found.append((row[n], lo))
+                lo += 1
+            i = depth + 1
+            first, last = max(1, i - d), min(n, i + d)
+            while lo < hi:
+                key = keys[lo]
+                c = key[depth]
+                end = bisect_left(keys, key[:depth] + chr(ord(c) + 1), lo, hi)
+                next_row = [far] * (n + 1)
+                if i <= d: next_row[0] = i
+                best = next_row[0]
+                for j in range(first, last + 1):
+                    x = min(next_row[j-1] + 1, row[j] + 1, row[j-1] + (q[j-1] != c), far)
+                    next_row[j] = x
+                    if x < best: best = x
+                if best <= d:
+                    stack.append((lo, end, i, next_row))
+                lo = end
+        found.sort(key=lambda x: (x[0], keys[x[1]]))
+        return [(d, name) for d, i in found for name in self.names[i]]
+
+    def _names(self, i, query, prefix=False):
+        # Lemmas with diacritics are only matched by queries with the same diacritics, but
+        # queries without diacritics match all of them
+        names, query = self.names[i], query.lower()
+        if query == fold(query):
+            return names
+        if prefix:
+            return [x for x in names if x.startswith(query)]
+        return [x for x in names if x == query]
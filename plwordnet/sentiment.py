@@ -0,0 +1,145 @@
+"""Columnar index of emotional annotations.
+
+`SentimentIndex` keeps every annotation of the wordnet as a row of four columns: the id of its
+lexical unit, its polarity (-2 to 2, like the values of `POLARITY_MAPPING`, or `NO_POLARITY`),
+and bitmasks of its emotions and valuations, where bit `i` stands for `emotion_names[i]` or
+`valuation_names[i]`. Rows are sorted by unit id, and the rows of each unit are found with a
+dict. Inverted indexes map every emotion, valuation and polarity to the rows which have it, so
+that queries only scan the rows of their rarest condition.
+
+`score` aggregates the annotations of a batch of lexical unit ids (like the units found in a
+document) into polarity, emotion and valuation histograms, which are `array('i')` columns.
+Repeated ids are grouped with `Counter` and count as many times as they occur: each unit adds
+its multiplicity to precomputed histogram slots.
+"""
+
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+NO_POLARITY = -128
+POLARITIES = range(-2, 3)
+
+
+@dataclass
+class SentimentScore:
+    __slots__ = 'units annotated annotations polarity polarity_histogram emotions valuations'.split()
+    units: int
+    annotated: int
+    annotations: int
+    polarity: Optional[float]
+    polarity_histogram: array
+    emotions: array
+    valuations: array
+
+
+class SentimentIndex:
+    def __init__(self, items):
+        """Builds the index from (lexical unit id, list of `EmotionalAnnotation`) pairs."""
+        items = sorted(((id, annotations) for id, annotations in items if annotations), key=lambda x: x[0])
+        self.emotion_names = sorted({x for _, annotations in items for a in annotations for x in a.emotions})
+        self.valuation_names = sorted({x for _, annotations in items for a in annotations for x in a.valuations})
+        assert len(self.emotion_names) <= 64 and len(self.valuation_names) <= 64, 'Too many emotions or valuations for a bitmask'
+        emotion_bit = {x: 1 << i for i, x in enumerate(self.emotion_names)}
+        valuation_bit = {x: 1 << i for i, x in enumerate(self.valuation_names)}
+
+        self.units, self.polarity = array('i'), array('b')
+        self.emotions, self.valuations = array('Q'), array('Q')
+        # rows[id] is the range of rows of the annotations of unit `id`
+        self.rows = dict()
+        for id, annotations in items:
+            self.rows[id] = len(self.units), len(self.units) + len(annotations)
+            for a in annotations:
+                self.units.append(id)
+                self.polarity.append(NO_POLARITY if a.polarity is None else a.polarity)
+                self.emotions.append(_mask(emotion_bit, a.emotions))
+                self.valuations.append(_mask(valuation_bit, a.valuations))
+
+        self.by_emotion = {x: _rows(self.emotions, bit) for x, bit in emotion_bit.items()}
+        self.by_valuation = {x: _rows(self.valuations, bit) for x, bit in valuation_bit.items()}
+        self.by_polarity = {p: array('i', (i for i, x in enumerate(self.polarity) if x == p)) for p in POLARITIES}
+        self._slots = dict()
+
+    def __len__(self):
+        return len(self.units)
+
+    def where(self, *, polarity=None, emotions=(), valuations=()):
+        """Returns sorted ids of units with an annotation of `polarity`, and all of `emotions` and `valuations`."""
+        if isinstance(emotions, str): emotions = [emotions]
+        if isinstance(valuations, str): valuations = [valuations]
+        for x in emotions:
+            if x not in self.by_emotion: return []
+        for x in valuations:
+            if x not in self.by_valuation: return []
+        if polarity is not None and polarity not in self.by_polarity: return []
+
+        emotion_mask = sum(1 << self.emotion_names.index(x) for x in set(emotions))
+        valuation_mask = sum(1 << self.valuation_names.index(x) for x in set(valuations))
+        postings = [self.by_emotion[x] for x in emotions] + [self.by_valuation[x] for x in valuations]
+        if polarity is not None: postings.append(self.by_polarity[polarity])
+        rows = min(postings, key=len) if postings else range(len(self.units))
+
+        res = []
+        for i in rows:
+            if polarity is not None and self.polarity[i] != polarity: continue
+            if self.emotions[i] & emotion_mask != emotion_mask: continue
+            if self.valuations[i] & valuation_mask != valuation_mask: continue
+            id = self.units[i]
+            # Rows are sorted by unit, so duplicates are adjacent
+            if not res or res[-1] != id: res.append(id)
+        return res
+
+    def score(self, ids):
+        """Returns the `SentimentScore` of the annotations of lexical units with `ids` (repeated ids are counted again)."""
+        # Histograms are kept in one array: polarities, then emotions, then valuations
+        npol, nemo = len(POLARITIES), len(self.emotion_names)
+        histogram = array('i', bytes(4 * (npol + nemo + len(self.valuation_names))))
+        counts = Counter(ids)
+        units, annotated, annotations = sum(counts.values()), 0, 0
+        for id, n in counts.items():
+            slots = self._slots.get(id)
+            if slots is None:
+                if id not in self.rows: continue
+                slots = self._unit_slots(id)
+            annotated += n
+            annotations += n * (self.rows[id][1] - self.rows[id][0])
+            for i in slots: histogram[i] += n
+        polarity_histogram = histogram[:npol]
+        total = sum(polarity_histogram)
+        mean = sum(p * n for p, n in zip(POLARITIES, polarity_histogram)) / total if total else None
+        return SentimentScore(units=units, annotated=annotated, annotations=annotations, polarity=mean,
+                              polarity_histogram=polarity_histogram, emotions=histogram[npol:npol+nemo],
+                              valuations=histogram[npol+nemo:])
+
+    def polarities(self, ids):
+        """Returns an `array('d')` of the mean polarity of each unit id, with NaN for units without a polarity."""
+        rows, polarity, res = self.rows, self.polarity, array('d')
+        for id in ids:
+            values = [polarity[i] for i in range(*rows.get(id, (0, 0))) if polarity[i] != NO_POLARITY]
+            res.append(sum(values) / len(values) if values else float('nan'))
+        return res
+
+    def _unit_slots(self, id):
+        # Returns the histogram slots, which the annotations of a unit add one to, memoized per unit
+        npol, nemo, res = len(POLARITIES), len(self.emotion_names), []
+        for i in range(*self.rows[id]):
+            if self.polarity[i] != NO_POLARITY: res.append(self.polarity[i] + 2)
+            res += (npol + b for b in _bits(self.emotions[i]))
+            res += (npol + nemo + b for b in _bits(self.valuations[i]))
+        self._slots[id] = res = tuple(res)
+        return res
+
+
+def _mask(bit, names):
+    res = 0
+    for x in names: res |= bit[x]
+    return res
+
+
+def _bits(mask):
+    return [i for i in range(mask.bit_length()) if mask >> i & 1]
+
+
+def _rows(masks, bit):
+    return array('i', (i for i, x in enumerate(masks) if x & bit))
@@ -0,0 +1,398 @@
+"""HTTP/JSON query service, which shares one loaded wordnet between many client processes.
+
+    python -m plwordnet.server plwordnet_4_2.plwn --port 8042
+    python -m plwordnet.server plwordnet_4_2.plwn --unix /tmp/plwordnet.sock
+
+Every method is a `POST /<method>` request with a JSON object of parameters, answered with
+`{"result": ...}`, or `{"error": "..."}` and status 400 (404 for unknown methods). `POST /batch`
+takes a list of `{"method": ..., "params": ...}` objects and answers `{"results": [...]}` with
+one result or error object for each, and `GET /health` returns the sizes of the wordnet and
+counts of calls and batches. Results refer to synsets, lexical units and relation types by id,
+except for `find`, `lexical_units` and `synsets`, which describe lexical units and synsets:
+
+    find(lemma)                                  units of a lemma, or one unit of `lemma.variant`
+    lexical_units(ids), synsets(ids)             descriptions of units or synsets, or null
+    lexical_relations_where(subject, predicate, object)
+    synset_relations_where(subject, predicate, object)
+                                                 [subject, predicate, object] triples, where the
+                                                 predicate can also be given by name
+    hypernyms(synset, interlingual), hyponyms(synset, interlingual)
+    hypernym_paths(synset, full_search, interlingual)
+    similarity(a, b, measure, interlingual)      like `Wordnet.synset_similarity`
+
+The server runs on one asyncio event loop. Calls of the same method which arrive together
+(within one iteration of the loop, or within `batch_delay` seconds) are answered at once by a
+batch handler: relation queries of many subjects or objects go through `Relations.batch`, and
+similarities through `Similarity.pairs`, so the per-call overhead is paid once per batch.
+`Client` is a matching asyncio client, which keeps a pool of connections.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+from collections import defaultdict
+
+from .similarity import MEASURES
+from .wordnet import load
+
+PORT = 8042
+MAX_BATCH = 256
+MAX_BODY = 1 << 20
+POOL_SIZE = 8
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large'}
+
+
+class QueryError(Exception):
+    pass
+
+
+class Service:
+    def __init__(self, wn, *, max_batch=MAX_BATCH, batch_delay=0.0):
+        """Answers calls on `wn`, batching up to `max_batch` concurrent calls of each method."""
+        assert max_batch > 0, 'Argument `max_batch` must be positive'
+        self.wn = wn
+        self.max_batch, self.batch_delay = max_batch, batch_delay
+        self.calls = self.batches = 0
+        self._pending = dict()
+
+    async def call(self, method, params):
+        """Returns the result of `method` with a dict of `params`, computed in a batch with concurrent calls."""
+        if method not in METHODS: raise QueryError(f'Unknown method {method!r}')
+        if not isinstance(params, dict): raise QueryError('Parameters must be a JSON object')
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(method, [])
+        pending.append((params, future))
+        if len(pending) >= self.max_batch:
+            self._flush(method, pending)
+        elif len(pending) == 1:
+            if self.batch_delay: loop.call_later(self.batch_delay, self._flush, method, pending)
+            else: loop.call_soon(self._flush, method, pending)
+        return await future
+
+    def _flush(self, method, pending):
+        # A full batch is flushed at once, and then again when its scheduled flush comes, as an empty list
+        if self._pending.get(method) is pending: del self._pending[method]
+        pending[:], pending = [], list(pending)
+        if not pending: return
+        self.calls += len(pending)
+        self.batches += 1
+        try:
+            results = METHODS[method](self, [params for params, _ in pending])
+        except Exception as e:
+            results = [e] * len(pending)
+        for (_, future), res in zip(pending, results):
+            if future.done(): continue
+            if isinstance(res, Exception): future.set_exception(res)
+            else: future.set_result(res)
+
+    # Batch handlers take a list of parameter dicts, and return a result or an exception for each
+
+    def _find(self, calls):
+        def find(lemma):
+            res = self.wn.find(lemma)
+            if isinstance(res, list): return [_unit(x) for x in res]
+            return None if res is None else _unit(res)
+        return _each(find, calls)
+
+    def _lexical_units(self, calls):
+        table = self.wn.lexical_units
+
+        def lexical_units(ids):
+            return [_unit(table[x]) if x in table else None for x in ids]
+        return _each(lexical_units, calls)
+
+    def _synsets(self, calls):
+        table = self.wn.synsets
+
+        def synsets(ids):
+            return [_synset(table[x]) if x in table else None for x in ids]
+        return _each(synsets, calls)
+
+    def _lexical_relations_where(self, calls):
+        return self._relations_where(self.wn.lexical_relations, calls)
+
+    def _synset_relations_where(self, calls):
+        return self._relations_where(self.wn.synset_relations, calls)
+
+    def _relations_where(self, relations, calls):
+        # Calls with either a subject or an object (and any predicate) are grouped by field and
+        # predicate, and answered with one `Relations.batch` per group
+        results, groups = [None] * len(calls), defaultdict(list)
+        for i, params in enumerate(calls):
+            try:
+                s, p, o = self._pattern(**params)
+                if (s is None) != (o is None):
+                    groups['s' if o is None else 'o', p].append((i, o if s is None else s))
+                else:
+                    results[i] = [list(relations[x]) for x in relations.where(s, p, o)]
+            except Exception as e:
+                results[i] = e
+        for (field, p), members in groups.items():
+            batch = relations.batch(field, [id for _, id in members], None if p is None else [p])
+            for j, (i, _) in enumerate(members):
+                lo, hi = batch.offsets[j], batch.offsets[j+1]
+                results[i] = [[batch.subjects[k], batch.predicates[k], batch.objects[k]] for k in range(lo, hi)]
+        return results
+
+    def _pattern(self, subject=None, predicate=None, object=None):
+        if isinstance(predicate, str): predicate = self.wn.relation_by_name[predicate].id
+        for x in (subject, predicate, object):
+            if x is not None and type(x) is not int: raise QueryError(f'Expected an integer id, got {x!r}')
+        if subject is None and predicate is None and object is None:
+            raise QueryError('Expected at least a subject, predicate or object')
+        return subject, predicate, object
+
+    def _hypernyms(self, calls):
+        def hypernyms(synset, interlingual=False):
+            return list(self.wn.hierarchy(interlingual).hypernyms(synset))
+        return _each(hypernyms, calls)
+
+    def _hyponyms(self, calls):
+        relations = self.wn.synset_relations
+
+        def hyponyms(synset, interlingual=False):
+            predicates = [rel.id for rel in self.wn._get_hyponym_relations(interlingual)]
+            return [relations[x][0] for p in predicates for x in relations.where(None, p, synset)]
+        return _each(hyponyms, calls)
+
+    def _hypernym_paths(self, calls):
+        def hypernym_paths(synset, full_search=False, interlingual=False):
+            found = self.wn.hypernym_paths(self.wn.synsets[synset], full_search=full_search, interlingual=interlingual)
+            return [[None if x is None else x.id for x in path] for path in found]
+        return _each(hypernym_paths, calls)
+
+    def _similarity(self, calls):
+        # Pairs are scored together for each measure
+        def similarity(a, b, measure='path', interlingual=False):
+            if measure not in MEASURES: raise QueryError(f'Unknown similarity measure {measure!r}')
+            return a, b, measure, bool(interlingual)
+
+        results, groups = [None] * len(calls), defaultdict(list)
+        for i, params in enumerate(calls):
+            try:
+                a, b, measure, interlingual = similarity(**params)
+                if a not in self.wn.synsets or b not in self.wn.synsets: raise KeyError(a if a not in self.wn.synsets else b)
+            except Exception as e:
+                results[i] = e
+                continue
+            groups[measure, interlingual].append((i, (a, b)))
+        for (measure, interlingual), members in groups.items():
+            scores = self.wn.similarity(interlingual).pairs([pair for _, pair in members], measure)
+            for (i, _), x in zip(members, scores):
+                results[i] = None if math.isnan(x) else x
+        return results
+
+    # HTTP
+
+    async def handle(self, reader, writer):
+        """Serves the requests of one connection, until the client closes it."""
+        try:
+            while True:
+                try:
+                    request = await _read_message(reader, request=True)
+                except QueryError as e:
+                    _write_message(writer, 400, {'error': str(e)}, keep_alive=False)
+                    break
+                if request is None: break
+                (verb, path), headers, body = request
+                status, payload = await self._respond(verb, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                _write_message(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive: break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, verb, path, body):
+        name = path.strip('/')
+        if verb == 'GET' and name == 'health':
+            wn = self.wn
+            return 200, {'status': 'ok', 'lexical_units': len(wn.lexical_units), 'synsets': len(wn.synsets),
+                         'calls': self.calls, 'batches': self.batches}
+        if verb != 'POST': return 404, {'error': f'Unknown path {path}'}
+        try:
+            params = json.loads(body or b'{}')
+        except ValueError as e:
+            return 400, {'error': f'Malformed JSON: {e}'}
+        if name == 'batch':
+            if not isinstance(params, list): return 400, {'error': 'A batch must be a JSON list'}
+            return 200, {'results': await asyncio.gather(*(self._batch_call(x) for x in params))}
+        if name not in METHODS: return 404, {'error': f'Unknown method {name!r}'}
+        res = await self._batch_call({'method': name, 'params': params})
+        return (400 if 'error' in res else 200), res
+
+    async def _batch_call(self, call):
+        try:
+            return {'result': await self.call(call['method'], call.get('params', {}))}
+        except Exception as e:
+            return {'error': _error(e)}
+
+
+METHODS = {
+    'find': Service._find,
+    'lexical_units': Service._lexical_units,
+    'synsets': Service._synsets,
+    'lexical_relations_where': Service._lexical_relations_where,
+    'synset_relations_where': Service._synset_relations_where,
+    'hypernyms': Service._hypernyms,
+    'hyponyms': Service._hyponyms,
+    'hypernym_paths': Service._hypernym_paths,
+    'similarity': Service._similarity,
+}
+
+
+class Client:
+    def __init__(self, host='127.0.0.1', port=PORT, *, path=None, pool_size=POOL_SIZE):
+        """Connects to a server on a TCP port, or on the unix socket `path`, with up to `pool_size` connections."""
+        self.host, self.port, self.path = host, port, path
+        self._idle = []
+        self._slots = asyncio.Semaphore(pool_size)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+    def __getattr__(self, method):
+        if method not in METHODS: raise AttributeError(method)
+        return lambda **params: self.call(method, **params)
+
+    async def call(self, method, **params):
+        """Returns the result of a call, or raises `QueryError`."""
+        res = await self._request('POST', f'/{method}', params)
+        if 'error' in res: raise QueryError(res['error'])
+        return res['result']
+
+    async def batch(self, calls):
+        """Makes (method, params) calls in one request, and returns their results, with `QueryError` objects for errors."""
+        res = await self._request('POST', '/batch', [{'method': m, 'params': p} for m, p in calls])
+        return [QueryError(x['error']) if 'error' in x else x['result'] for x in res['results']]
+
+    async def health(self):
+        return await self._request('GET', '/health')
+
+    async def _request(self, verb, path, payload=None):
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else await self._connect()
+            reader, writer = connection
+            try:
+                body = b'' if payload is None else json.dumps(payload).encode()
+                writer.write(f'{verb} {path} HTTP/1.1\r\nHost: plwordnet\r\nContent-Type: application/json\r\n'
+                             f'Content-Length: {len(body)}\r\n\r\n'.encode('latin-1') + body)
+                await writer.drain()
+                response = await _read_message(reader, request=False)
+                if response is None: raise ConnectionError('Connection closed by the server')
+            except BaseException:
+                writer.close()
+                raise
+            (_, status), headers, body = response
+            if headers.get('connection', '').lower() == 'close': writer.close()
+            else: self._idle.append(connection)
+            return json.loads(body)
+
+    async def _connect(self):
+        if self.path is not None: return await asyncio.open_unix_connection(self.path)
+        return await asyncio.open_connection(self.host, self.port)
+
+
+async def serve(wn, host='127.0.0.1', port=PORT, *, path=None, max_batch=MAX_BATCH, batch_delay=0.0):
+    """Serves queries on `wn` on a TCP port, or on the unix socket `path`, until cancelled."""
+    service = Service(wn, max_batch=max_batch, batch_delay=batch_delay)
+    if path is not None:
+        server = await asyncio.start_unix_server(service.handle, path)
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def _each(f, calls):
+    res = []
+    for params in calls:
+        try:
+            res.append(f(**params))
+        except Exception as e:
+            res.append(e)
+    return res
+
+
+def _unit(lu):
+    return dict(id=lu.id, name=lu.name, variant=lu.variant, pos=lu.pos, language=lu.language, domain=lu.domain,
+                synset=None if lu.synset is None else lu.synset.id)
+
+
+def _synset(synset):
+    return dict(id=synset.id, definition=synset.definition, lexical_units=[x.id for x in synset.lexical_units])
+
+
+def _error(e):
+    return str(e) if isinstance(e, QueryError) else f'{type(e).__name__}: {e}'
+
+
+async def _read_message(reader, request):
+    # Reads an HTTP/1.1 request or response with a Content-Length body, or returns None at the end of the stream
+    line = await reader.readline()
+    if not line: return None
+    try:
+        first, second, _ = line.decode('latin-1').split(' ', 2)
+        start = (first, second) if request else (first, int(second))
+    except ValueError:
+        raise QueryError('Malformed start line') from None
+    headers = dict()
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''): break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if 'chunked' in headers.get('transfer-encoding', ''): raise QueryError('Chunked bodies are not supported')
+    try:
+        length = int(headers.get('content-length', 0))
+        if length < 0: raise ValueError
+    except ValueError:
+        raise QueryError('Malformed Content-Length') from None
+    if request and length > MAX_BODY: raise QueryError(f'Bodies are limited to {MAX_BODY} bytes')
+    body = await reader.readexactly(length) if length else b''
+    return start, headers, body
+
+
+def _write_message(writer, status, payload, keep_alive=True):
+    body = json.dumps(payload, ensure_ascii=False).encode()
+    head = (f'HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+    writer.write(head.encode('latin-1') + body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('wordnet', help='path to the wordnet file passed to `plwordnet.load` (a snapshot is memory-mapped)')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=PORT, help='TCP port to listen on')
+    parser.add_argument('--unix', default=None, help='path of a unix socket to listen on instead of a TCP port')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help='largest number of calls answered at once')
+    parser.add_argument('--batch-delay', type=float, default=0.0, help='milliseconds to wait for more calls of a method')
+    args = parser.parse_args()
+
+    wn = load(args.wordnet, mmap=True) if args.wordnet.endswith('.plwn') else load(args.wordnet)
+    where = args.unix if args.unix is not None else f'{args.host}:{args.port}'
+    print(f'serving {len(wn.lexical_units)} lexical units on {where}', file=sys.stderr, flush=True)
+    try:
+        asyncio.run(serve(wn, args.host, args.port, path=args.unix, max_batch=args.max_batch,
+                          batch_delay=args.batch_delay / 1000))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
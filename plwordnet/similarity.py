@@ -0,0 +1,148 @@
+"""Semantic similarity of synsets in the hypernym hierarchy.
+
+`Similarity` implements the measures of NLTK's WordNet interface on top of `Hierarchy`: the
+shortest path distance, and path, Leacock-Chodorow (LCH), Wu-Palmer (WUP), Resnik and Lin
+similarity. Distances from a synset to each of its ancestors are found with a breadth-first
+search and kept in an LRU cache of `DISTANCE_CACHE_SIZE` synsets, so scoring a pair usually only
+intersects the two (small) tables, and a long-lived wordnet does not keep one for every synset.
+
+Information content (IC) of a synset is `-log(p)`, where `p` is the summed `tag_count` of its
+lexical units and of all its hyponyms (each counted once), divided by the total of all synsets.
+`smoothing` is added to the count of each synset, so that untagged synsets have a finite IC.
+
+Measures return `None` for synsets without a common hypernym. The batch methods `pairs` and
+`matrix` return `array('d')` columns (with NaN in place of `None`), which can be wrapped with
+`numpy.frombuffer` without copying.
+"""
+
+import math
+from array import array
+from functools import lru_cache
+
+MEASURES = 'path lch wup res lin'.split()
+DISTANCE_CACHE_SIZE = 1 << 14
+
+
+class Similarity:
+    def __init__(self, wn, hierarchy, smoothing=1.0):
+        self.wn = wn
+        self.hierarchy = hierarchy
+        self.smoothing = smoothing
+        # Lookups are skewed towards frequent synsets, so most distance tables come from the cache
+        self.distances = lru_cache(maxsize=DISTANCE_CACHE_SIZE)(self._distances)
+        self._depth = None
+        self._ic = None
+
+    def _distances(self, id):
+        # Returns a dict from ids of synset `id` and all its hypernyms to their shortest distance from it
+        res, level, d = {id: 0}, [id], 0
+        while level:
+            d += 1
+            next_level = []
+            for x in level:
+                for h in self.hierarchy.hypernyms(x):
+                    if h not in res:
+                        res[h] = d
+                        next_level.append(h)
+            level = next_level
+        return res
+
+    def _common(self, a, b):
+        # Yields (ancestor, distance from a, distance from b) for common hypernyms of a and b
+        da, db = self.distances(a), self.distances(b)
+        if len(db) < len(da):
+            for x, d in db.items():
+                if x in da: yield x, da[x], d
+        else:
+            for x, d in da.items():
+                if x in db: yield x, d, db[x]
+
+    def lowest_common_hypernyms(self, a, b):
+        """Returns sorted ids of the deepest (by `max_depth`) common hypernyms of synsets `a` and `b`."""
+        common = [x for x, _, _ in self._common(a, b)]
+        if not common:
+            return []
+        depth = {x: self.hierarchy.max_depth(x) for x in common}
+        deepest = max(depth.values())
+        return sorted(x for x in common if depth[x] == deepest)
+
+    def shortest_path_distance(self, a, b):
+        """Returns the number of edges on the shortest path from `a` to `b` through a common hypernym."""
+        return min((da + db for _, da, db in self._common(a, b)), default=None)
+
+    def path(self, a, b):
+        d = self.shortest_path_distance(a, b)
+        return None if d is None else 1 / (d + 1)
+
+    def lch(self, a, b):
+        d = self.shortest_path_distance(a, b)
+        return None if d is None else -math.log((d + 1) / (2 * self.depth()))
+
+    def wup(self, a, b):
+        best = None
+        for x, da, db in self._common(a, b):
+            # Like NLTK, the subsumer is the deepest common hypernym, and ties go to the shorter path
+            depth = self.hierarchy.max_depth(x) + 1
+            key = depth, -(da + db)
+            if best is None or key > best[0]:
+                best = key, 2 * depth / (da + db + 2 * depth)
+        return None if best is None else best[1]
+
+    def res(self, a, b):
+        ic = self.ic()
+        return max((ic[x] for x, _, _ in self._common(a, b)), default=None)
+
+    def lin(self, a, b):
+        ic = self.ic()
+        lcs = max((ic[x] for x, _, _ in self._common(a, b)), default=None)
+        if lcs is None: return None
+        total = ic[a] + ic[b]
+        return 2 * lcs / total if total else 1.0
+
+    def depth(self):
+        """Returns the number of synsets on the longest hypernym path, used by the LCH measure."""
+        if self._depth is None:
+            self._depth = 1 + max((self.hierarchy.max_depth(x) for x in self.wn.synsets), default=0)
+        return self._depth
+
+    def ic(self):
+        """Returns a dict from synset ids to their information content.
+
+        The first call walks up from every synset to all its hypernyms, so it takes time
+        proportional to the summed number of ancestors of all synsets. Ancestor sets are not kept,
+        so only one is in memory at a time. The result is cached.
+        """
+        if self._ic is None:
+            own = {x.id: self.smoothing + sum(lu.tag_count for lu in x.lexical_units) for x in self.wn.synsets.values()}
+            counts = dict.fromkeys(own, 0.0)
+            for id, n in own.items():
+                # Walk up without memoizing the ancestor sets, which would take a lot of memory
+                seen, todo = {id}, [id]
+                while todo:
+                    for h in self.hierarchy.hypernyms(todo.pop()):
+                        if h not in seen:
+                            seen.add(h)
+                            todo.append(h)
+                for x in seen:
+                    counts[x] += n
+            total = sum(own.values())
+            self._ic = {x: -math.log(n / total) if n else math.inf for x, n in counts.items()}
+        return self._ic
+
+    def pairs(self, pairs, measure='path'):
+        """Returns an `array('d')` of `measure` scores of (a, b) synset id pairs."""
+        assert measure in MEASURES, f'Unknown similarity measure {measure!r}'
+        score = getattr(self, measure)
+        return array('d', (_nan(score(a, b)) for a, b in pairs))
+
+    def matrix(self, rows, columns=None, measure='path'):
+        """Returns a row-major `array('d')` of `measure` scores of each synset id in `rows` against each in `columns`."""
+        assert measure in MEASURES, f'Unknown similarity measure {measure!r}'
+        score = getattr(self, measure)
+        rows = list(rows)
+        columns = rows if columns is None else list(columns)
+        return array('d', (_nan(score(a, b)) for a in rows for b in columns))
+
+
+def _nan(x):
+    return math.nan if x is None else x
@@ -0,0 +1,434 @@
+"""Binary snapshot format for `Wordnet` objects.
+
+A snapshot stores the wordnet as typed columns: one row per lexical unit, synset, relation
+type, emotional annotation and relation triple, with every string kept once in a shared
+string table. Loading a snapshot only slices the file into arrays, and `LexicalUnit` and
+`Synset` objects are built the first time they are accessed. Unlike pickle, reading a
+snapshot never executes code stored in the file.
+
+Snapshots can also be memory-mapped (`load(path, mmap=True)`). The columns are then read
+straight from the page cache, which the operating system shares between all processes that
+map the same file, so many worker processes cost about as much memory as one. Only objects
+returned from queries are allocated in each process.
+
+File layout (all integers little-endian):
+
+    header   magic (8 bytes), version (u16), byte order (u8), padding (u8), section count (u32)
+    toc      for every section: name (24 bytes), typecode (1 byte), padding (7 bytes),
+             offset (u64), item count (u64)
+    data     sections, each aligned to 8 bytes, stored in the byte order given in the header
+"""
+
+import io
+import mmap as _mmap
+import struct
+import sys
+from array import array
+from collections.abc import Mapping, MutableMapping, Sequence
+
+from .display import POS_STR
+from .graph import Relations, _find
+from .wordnet import Wordnet, RelationType, EmotionalAnnotation, Synset, LexicalUnit, _RICH_DESCRIPTION
+
+
+MAGIC = b'PLWNSNAP'
+VERSION = 2
+EXTENSION = '.plwn'
+
+_HEADER = struct.Struct('<8sHBxI')
+_SECTION = struct.Struct('<24sc7xQQ')
+_BYTE_ORDER = {'little': 0, 'big': 1}
+_NONE = -1
+_NO_POLARITY = -128
+
+assert array('i').itemsize == 4 and array('q').itemsize == 8, 'Unsupported platform integer sizes'
+
+
+def dump(wn, dst):
+    """Write wordnet `wn` as a snapshot to opened binary file or path `dst`."""
+    if isinstance(dst, str):
+        with open(dst, 'wb') as f:
+            return dump(wn, f)
+
+    strings = _StringTable()
+    s = dict()
+
+    lus = list(wn.lexical_units.values())
+    s['lu_id'] = array('i', (x.id for x in lus))
+    s['lu_name'] = array('i', (strings.add(x.name) for x in lus))
+    s['lu_variant'] = array('i', (x.variant for x in lus))
+    s['lu_pos'] = array('i', (strings.add(x.pos_pl) for x in lus))
+    s['lu_domain'] = array('i', (strings.add(x.domain) for x in lus))
+    s['lu_tag_count'] = array('i', (x.tag_count for x in lus))
+    s['lu_description'] = array('i', (strings.add(x.description) for x in lus))
+    s['lu_synset'] = array('i', (_NONE if x.synset is None else x.synset.id for x in lus))
+    s['lu_sorted'], s['lu_rows'] = _sorted_rows(s['lu_id'])
+
+    sentiment = [a for x in lus for a in x.sentiment]
+    s['lu_sentiment'] = _offsets(len(x.sentiment) for x in lus)
+    s['sent_polarity'] = array('b', (_NO_POLARITY if a.polarity is None else a.polarity for a in sentiment))
+    for name in 'emotions valuations examples'.split():
+        s[f'sent_{name}'] = _offsets(len(getattr(a, name)) for a in sentiment)
+        s[f'sent_{name}_str'] = array('i', (strings.add(x) for a in sentiment for x in getattr(a, name)))
+
+    synsets = list(wn.synsets.values())
+    s['syn_id'] = array('i', (x.id for x in synsets))
+    s['syn_definition'] = array('i', (strings.add(x.definition) for x in synsets))
+    s['syn_description'] = array('i', (strings.add(x.description) for x in synsets))
+    s['syn_split'] = array('i', (x.split for x in synsets))
+    s['syn_abstract'] = array('b', (x.abstract for x in synsets))
+    s['syn_units'] = _offsets(len(x.lexical_units) for x in synsets)
+    s['syn_unit_id'] = array('i', (lu.id for x in synsets for lu in x.lexical_units))
+    s['syn_sorted'], s['syn_rows'] = _sorted_rows(s['syn_id'])
+
+    rels = list(wn.relation_types.values())
+    s['rel_id'] = array('i', (x.id for x in rels))
+    for name in 'name type description shortcut display'.split():
+        s[f'rel_{name}'] = array('i', (strings.add(getattr(x, name)) for x in rels))
+    s['rel_autoreverse'] = array('b', (x.autoreverse for x in rels))
+    s['rel_pos'] = _offsets(len(x.pos) for x in rels)
+    s['rel_pos_str'] = array('i', (strings.add(x) for r in rels for x in r.pos))
+    s['rel_parent'] = array('i', (_NONE if x.parent is None else x.parent.id for x in rels))
+    s['rel_inverse'] = array('i', (_NONE if x.inverse is None else x.inverse.id for x in rels))
+    s['rel_by_name'] = array('i', (x.id for x in wn.relation_by_name.values()))
+
+    for kind in 'synset lexical'.split():
+        relations = getattr(wn, f'{kind}_relations')
+        for field in 'spo':
+            s[f'{kind}_{field}_keys'], s[f'{kind}_{field}_offsets'], s[f'{kind}_{field}_order'] = relations.groups[field]
+            s[f'{kind}_{field}'] = relations.columns[field]
+        for field in 'so':
+            s[f'{kind}_{field}_composite'] = relations.composite[field]
+
+    names = sorted((k, v) for k, v in wn.lexical_units_by_name.items() if v)
+    s['name_key'] = array('i', (strings.add(k) for k, _ in names))
+    s['name_units'] = _offsets(len(v) for _, v in names)
+    s['name_unit_id'] = array('i', (x for _, v in names for x in v))
+
+    # Rich descriptions are not stored, they are parsed again on access after loading
+    parsed = any(_RICH_DESCRIPTION.__get__(x) is not None for x in lus)
+    s['meta'] = array('q', [wn.sentiment_count, wn.description_count, wn.description_errors, parsed])
+    s['str_offsets'], s['str_data'] = strings.finish()
+
+    _write(dst, s)
+
+
+def load(src, *, mmap=False):
+    """Read a snapshot from opened binary file or path `src`, or from a buffer.
+
+    If `mmap` is true, the file is mapped into memory instead of being read, which requires
+    `src` to be an uncompressed file on disk.
+    """
+    if isinstance(src, str):
+        with open(src, 'rb') as f:
+            return load(f, mmap=mmap)
+    if mmap:
+        if not isinstance(src, (io.BufferedReader, io.FileIO)):
+            raise ValueError('Only uncompressed snapshot files on disk can be memory-mapped')
+        src = _mmap.mmap(src.fileno(), 0, access=_mmap.ACCESS_READ)
+    elif hasattr(src, 'read'):
+        src = src.read()
+    return _Reader(_read(src)).wordnet()
+
+
+class SnapshotWordnet(Wordnet):
+    """Read-only wordnet backed by the columns of a snapshot."""
+
+    def __reduce__(self):
+        raise TypeError('Snapshot wordnets cannot be pickled, load the snapshot file in each process instead')
+
+    def _sentiment_items(self):
+        # Annotations are read from the columns, except for units which were built (and may have been changed)
+        table, reader = self.lexical_units, self._reader
+        for row, id in enumerate(reader.lu_id):
+            if id in table.cache or id in table.removed: continue
+            if reader.lu_sentiment[row] < reader.lu_sentiment[row+1]: yield id, reader.sentiment(row)
+        for lu in table.cache.values():
+            if lu.sentiment: yield lu.id, lu.sentiment
+
+    def _unit_keys(self, ids):
+        # Names and variants are read from the columns, so that only units which get annotations are built
+        table, reader = self.lexical_units, self._reader
+        for id in ids:
+            lu = table.cache.get(id)
+            if lu is not None:
+                yield id, lu.name, lu.variant
+                continue
+            row = table.row(id)
+            if row is not None: yield id, reader.strings[reader.lu_name[row]], reader.lu_variant[row]
+
+    def _node_pos(self, kind):
+        # Parts of speech are read from the columns, except for objects which were built
+        reader, units = self._reader, self.lexical_units
+        if kind == 'lexical':
+            for id in units: yield id, self._unit_pos(id)
+            return
+        for id in self.synsets:
+            synset = self.synsets.cache.get(id)
+            if synset is not None:
+                yield id, synset.lexical_units[0].pos_pl if synset.lexical_units else None
+                continue
+            row = self.synsets.row(id)
+            lo, hi = reader.syn_units[row], reader.syn_units[row+1]
+            yield id, self._unit_pos(reader.syn_unit_id[lo]) if lo < hi else None
+
+    def _unit_pos(self, id):
+        lu = self.lexical_units.cache.get(id)
+        if lu is not None: return lu.pos_pl
+        row = self.lexical_units.row(id)
+        return None if row is None else self._reader.strings[self._reader.lu_pos[row]]
+
+
+def _write(file, sections, magic=MAGIC, version=VERSION):
+    # Sections are arrays, memoryviews of a loaded snapshot, or bytes
+    start = _HEADER.size + _SECTION.size * len(sections)
+    toc, offset = [], _align(start)
+    for name, data in sections.items():
+        typecode = data.typecode if isinstance(data, array) else data.format if isinstance(data, memoryview) else 'B'
+        toc.append(_SECTION.pack(name.encode('ascii'), typecode.encode('ascii'), offset, len(data)))
+        offset = _align(offset + len(data) * array(typecode).itemsize)
+    file.write(_HEADER.pack(magic, version, _BYTE_ORDER[sys.byteorder], len(sections)))
+    file.write(b''.join(toc))
+    position = start
+    for data in sections.values():
+        file.write(bytes(_align(position) - position))
+        data = data.tobytes() if isinstance(data, (array, memoryview)) else data
+        file.write(data)
+        position = _align(position) + len(data)
+
+
+def _read(buf, magic=MAGIC, version=VERSION, kind='wordnet snapshot'):
+    view = memoryview(buf)
+    if len(view) < _HEADER.size:
+        raise ValueError(f'File is too short to be a {kind}')
+    found_magic, found_version, order, count = _HEADER.unpack_from(view)
+    if found_magic != magic:
+        raise ValueError(f'File is not a {kind}')
+    if found_version != version:
+        raise ValueError(f'Unsupported {kind} version {found_version} (expected {version})')
+    if order != _BYTE_ORDER[sys.byteorder]:
+        raise ValueError(f'The {kind} was written on a machine with a different byte order')
+    sections = dict()
+    for i in range(count):
+        name, typecode, offset, length = _SECTION.unpack_from(view, _HEADER.size + i * _SECTION.size)
+        name, typecode = name.rstrip(b'\0').decode('ascii'), typecode.decode('ascii')
+        if typecode not in 'bBiq':
+            raise ValueError(f'Unsupported column type {typecode!r} in section {name!r} of the {kind}')
+        end = offset + length * array(typecode).itemsize
+        if end > len(view):
+            raise ValueError(f'Section {name!r} of the {kind} is out of bounds')
+        sections[name] = view[offset:end].cast(typecode)
+    return sections
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _offsets(lengths):
+    res, total = array('q', [0]), 0
+    for n in lengths:
+        total += n
+        res.append(total)
+    return res
+
+
+def _sorted_rows(ids):
+    rows = sorted(range(len(ids)), key=ids.__getitem__)
+    return array('i', (ids[i] for i in rows)), array('i', rows)
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids = dict()
+
+    def add(self, x):
+        id = self.ids.get(x)
+        if id is None:
+            id = self.ids[x] = len(self.ids)
+        return id
+
+    def finish(self):
+        data = [x.encode('utf-8') for x in self.ids]
+        return _offsets(len(x) for x in data), b''.join(data)
+
+
+class _Strings(Sequence):
+    __slots__ = 'offsets data'.split()
+
+    def __init__(self, offsets, data):
+        self.offsets, self.data = offsets, data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.data[self.offsets[i]:self.offsets[i+1]], 'utf-8')
+
+
+class _StringList(Sequence):
+    # Sequence of the strings with ids in `keys`
+    __slots__ = 'keys strings'.split()
+
+    def __init__(self, keys, strings):
+        self.keys, self.strings = keys, strings
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, i):
+        return self.strings[self.keys[i]]
+
+
+class _NameIndex(Mapping):
+    # Read-only stand-in for `Wordnet.lexical_units_by_name`
+    __slots__ = 'keys offsets ids'.split()
+
+    def __init__(self, keys, offsets, ids):
+        self.keys, self.offsets, self.ids = keys, offsets, ids
+
+    def __getitem__(self, name):
+        i = _find(self.keys, name)
+        if i is None: return []
+        return list(self.ids[self.offsets[i]:self.offsets[i+1]])
+
+    def __contains__(self, name):
+        return _find(self.keys, name) is not None
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class _LazyTable(MutableMapping):
+    # Mapping from ids to objects, which are built by `make(row)` on first access.
+    # Objects can still be added and removed, like in the dicts it replaces.
+    __slots__ = 'ids sorted rows make cache removed'.split()
+
+    def __init__(self, ids, sorted, rows, make):
+        self.ids, self.sorted, self.rows, self.make = ids, sorted, rows, make
+        self.cache, self.removed = dict(), set()
+
+    def row(self, id):
+        i = _find(self.sorted, id)
+        return None if i is None or id in self.removed else self.rows[i]
+
+    def __getitem__(self, id):
+        x = self.cache.get(id)
+        if x is not None: return x
+        row = self.row(id)
+        if row is None: raise KeyError(id)
+        return self.make(row)
+
+    def __setitem__(self, id, x):
+        self.cache[id] = x
+        self.removed.discard(id)
+
+    def __delitem__(self, id):
+        if id not in self: raise KeyError(id)
+        self.cache.pop(id, None)
+        if _find(self.sorted, id) is not None:
+            self.removed.add(id)
+
+    def __contains__(self, id):
+        return id in self.cache or self.row(id) is not None
+
+    def __iter__(self):
+        for id in self.ids:
+            if id not in self.removed: yield id
+        for id in self.cache:
+            if _find(self.sorted, id) is None: yield id
+
+    def __len__(self):
+        added = sum(1 for id in self.cache if _find(self.sorted, id) is None)
+        return len(self.ids) - len(self.removed) + added
+
+
+class _Reader:
+    def __init__(self, sections):
+        self.__dict__.update(sections)
+        self.strings = _Strings(self.str_offsets, self.str_data)
+        self.sentiment_count, self.description_count, self.description_errors, self.parsed = self.meta
+        self.lexical_units = _LazyTable(self.lu_id, self.lu_sorted, self.lu_rows, self.lexical_unit)
+        self.synsets = _LazyTable(self.syn_id, self.syn_sorted, self.syn_rows, self.synset)
+
+    def wordnet(self):
+        wn = SnapshotWordnet()
+        wn._reader = self
+        wn.lexical_units, wn.synsets = self.lexical_units, self.synsets
+        wn.sentiment_count, wn.description_count, wn.description_errors = \
+            self.sentiment_count, self.description_count, self.description_errors
+        wn.relation_types = self.relation_types()
+        wn.relation_by_name = {wn.relation_types[id].name: wn.relation_types[id] for id in self.rel_by_name}
+        for kind in 'synset lexical'.split():
+            columns = [getattr(self, f'{kind}_{x}') for x in 'spo']
+            groups = {x: tuple(getattr(self, f'{kind}_{x}_{y}') for y in 'keys offsets order'.split()) for x in 'spo'}
+            composite = {x: getattr(self, f'{kind}_{x}_composite') for x in 'so'}
+            setattr(wn, f'{kind}_relations', Relations(*columns, groups=groups, composite=composite))
+        wn.lexical_units_by_name = _NameIndex(_StringList(self.name_key, self.strings), self.name_units, self.name_unit_id)
+        return wn
+
+    def relation_types(self):
+        res, str = dict(), self.strings
+        for i, id in enumerate(self.rel_id):
+            pos = [str[x] for x in self.rel_pos_str[self.rel_pos[i]:self.rel_pos[i+1]]]
+            res[id] = RelationType(
+                id=id, name=str[self.rel_name[i]], type=str[self.rel_type[i]], pos=pos,
+                description=str[self.rel_description[i]], shortcut=str[self.rel_shortcut[i]],
+                display=str[self.rel_display[i]], autoreverse=bool(self.rel_autoreverse[i]),
+                parent=self.rel_parent[i], inverse=self.rel_inverse[i])
+        for rel in res.values():
+            rel.parent = None if rel.parent == _NONE else res[rel.parent]
+            rel.inverse = None if rel.inverse == _NONE else res[rel.inverse]
+        return res
+
+    def lexical_unit(self, row, synset=None):
+        # Units are built together with their synset, so that the references between them are set
+        id, synset_id = self.lu_id[row], self.lu_synset[row]
+        if synset is None and synset_id != _NONE and synset_id in self.synsets:
+            self.synsets[synset_id]
+            cached = self.lexical_units.cache.get(id)
+            if cached is not None: return cached
+        # Parts of speech and domains are interned, as they take a handful of values
+        str, pos = self.strings, sys.intern(self.strings[self.lu_pos[row]])
+        lu = LexicalUnit(
+            id=id, synset=synset, name=str[self.lu_name[row]], variant=self.lu_variant[row],
+            tag_count=self.lu_tag_count[row], pos_pl=pos, pos=POS_STR[pos],
+            language='en' if pos.endswith(' pwn') else 'pl', domain=sys.intern(str[self.lu_domain[row]]),
+            description=str[self.lu_description[row]], sentiment=self.sentiment(row), rich_description=None)
+        self.lexical_units.cache[id] = lu
+        return lu
+
+    def synset(self, row):
+        id = self.syn_id[row]
+        synset = Synset(
+            id=id, definition=self.strings[self.syn_definition[row]], split=self.syn_split[row],
+            abstract=bool(self.syn_abstract[row]), description=self.strings[self.syn_description[row]],
+            lexical_units=[])
+        self.synsets.cache[id] = synset
+        for lu_id in self.syn_unit_id[self.syn_units[row]:self.syn_units[row+1]]:
+            lu = self.lexical_units.cache.get(lu_id)
+            if lu is None:
+                lu_row = self.lexical_units.row(lu_id)
+                if lu_row is None: raise KeyError(lu_id)
+                home = self.lu_synset[lu_row] == id
+                lu = self.lexical_unit(lu_row, synset if home else None)
+            synset.lexical_units.append(lu)
+        synset.lexical_units = synset.lexical_units[:]
+        return synset
+
+    def sentiment(self, row):
+        res = []
+        for i in range(self.lu_sentiment[row], self.lu_sentiment[row+1]):
+            polarity = self.sent_polarity[i]
+            res.append(EmotionalAnnotation(
+                polarity=None if polarity == _NO_POLARITY else polarity,
+                emotions=self.string_list('emotions', i), valuations=self.string_list('valuations', i),
+                examples=self.string_list('examples', i)))
+        return res
+
+    def string_list(self, name, i):
+        offsets, ids = getattr(self, f'sent_{name}'), getattr(self, f'sent_{name}_str')
+        return [self.strings[x] for x in ids[offsets[i]:offsets[i+1]]]
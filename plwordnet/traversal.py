@@ -0,0 +1,179 @@
+"""Traversal of the synset and lexical unit graphs.
+
+`Traversal` walks the graph formed by a `Relations` store, optionally restricted to a set of
+relation types, in one direction: `out` follows triples from their subject to their object (as
+`*_relations_where(subject=x)` does), `in` from their object to their subject, and `both` follows
+either. Neighbours of a node are read straight from the CSR indexes of `Relations`: the range of
+the node in the subject (or object) order is found with a binary search, and within it, the
+range of each relation type with two more, as positions are sorted by predicate there. So no
+adjacency is built, and no `Synset` or `LexicalUnit` objects are created; all methods work with
+integer ids.
+
+Shortest paths are found with a bidirectional breadth-first search, which expands the smaller of
+the two frontiers one level at a time, and usually visits far fewer nodes than a search from
+one end.
+"""
+
+from bisect import bisect_left, bisect_right
+
+DIRECTIONS = 'out in both'.split()
+_REVERSE = {'out': 'in', 'in': 'out', 'both': 'both'}
+
+
+class Traversal:
+    def __init__(self, relations, predicates=None, direction='out'):
+        """Traverses `relations` along triples with one of `predicates` (relation type ids, or all if `None`)."""
+        assert direction in DIRECTIONS, f'Argument `direction` must be one of {DIRECTIONS}'
+        self.relations = relations
+        self.predicates = None if predicates is None else sorted(set(predicates))
+        self.direction = direction
+        self._forward = _neighbours(relations, self.predicates, direction)
+        self._backward = _neighbours(relations, self.predicates, _REVERSE[direction])
+
+    def neighbours(self, id):
+        """Returns ids of the nodes one step from node `id` (with repetitions, if several relations lead to a node)."""
+        return self._forward(id)
+
+    def bfs(self, start, max_depth=None):
+        """Yields (id, depth) of nodes reachable from `start` (an id or ids), nearest first, each once."""
+        neighbours = self._forward
+        level = _ids(start)
+        seen = set(level)
+        depth = 0
+        while level:
+            for id in level:
+                yield id, depth
+            if depth == max_depth: return
+            depth += 1
+            next_level = []
+            for id in level:
+                for x in neighbours(id):
+                    if x not in seen:
+                        seen.add(x)
+                        next_level.append(x)
+            level = next_level
+
+    def dfs(self, start, max_depth=None):
+        """Yields (id, depth) of nodes reachable from `start` (an id or ids) in depth-first preorder, each once.
+
+        With `max_depth`, all nodes within `max_depth` steps are yielded, like by `bfs`: a node first
+        reached on a long branch is expanded again when a shorter route to it is found, but it is
+        yielded only once, with the depth it was first reached at.
+        """
+        neighbours = self._forward
+        starts = _ids(start)
+        # The smallest depth each node has been pushed with
+        best = dict.fromkeys(starts, 0)
+        yielded = set()
+        stack = [(x, 0) for x in reversed(starts)]
+        while stack:
+            id, depth = stack.pop()
+            # Skip entries superseded by a shorter route pushed later
+            if depth > best[id]: continue
+            if id not in yielded:
+                yielded.add(id)
+                yield id, depth
+            if depth == max_depth: continue
+            for x in reversed(neighbours(id)):
+                if x not in best if max_depth is None else depth + 1 < best.get(x, max_depth + 1):
+                    best[x] = depth + 1
+                    stack.append((x, depth + 1))
+
+    def neighbourhood(self, start, k):
+        """Returns a dict from ids of nodes within `k` steps of `start` (an id or ids) to their distance."""
+        return dict(self.bfs(start, k))
+
+    def shortest_path(self, a, b, max_depth=None):
+        """Returns ids of nodes on a shortest path from `a` to `b` (both included), or `None`.
+
+        Paths longer than `max_depth` steps are not searched for.
+        """
+        if a == b: return [a]
+        # parents[side] maps reached nodes to the previous node on the way from a (or to b)
+        parents = [{a: None}, {b: None}]
+        frontiers = [[a], [b]]
+        neighbours = [self._forward, self._backward]
+        depth = 0
+        while frontiers[0] and frontiers[1]:
+            if max_depth is not None and depth >= max_depth: return None
+            depth += 1
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            mine, other = parents[side], parents[1-side]
+            next_frontier, meeting = [], None
+            for id in frontiers[side]:
+                for x in neighbours[side](id):
+                    if x in mine: continue
+                    mine[x] = id
+                    next_frontier.append(x)
+                    if meeting is None and x in other: meeting = x
+            if meeting is not None:
+                return _join(parents, meeting)
+            frontiers[side] = next_frontier
+        return None
+
+    def shortest_path_length(self, a, b, max_depth=None):
+        """Returns the number of steps on a shortest path from `a` to `b`, or `None`."""
+        path = self.shortest_path(a, b, max_depth)
+        return None if path is None else len(path) - 1
+
+
+def relation_ids(wn, relations):
+    """Returns ids of relation types given by ids, names or `RelationType` objects, and of all their descendants.
+
+    Descendants are relation types whose `parent` (or its parent, and so on) is one of the given ones.
+    """
+    if relations is None: return None
+    if isinstance(relations, (int, str)) or not hasattr(relations, '__iter__'):
+        relations = [relations]
+    found = set()
+    for rel in relations:
+        if isinstance(rel, str): rel = wn.relation_by_name[rel]
+        found.add(rel if isinstance(rel, int) else rel.id)
+    # Relation types are few, so their parents are followed without an index
+    for rel in wn.relation_types.values():
+        parent = rel.parent
+        while parent is not None and rel.id not in found:
+            if parent.id in found: found.add(rel.id)
+            parent = parent.parent
+    return found
+
+
+def _neighbours(relations, predicates, direction):
+    if direction == 'both':
+        out, in_ = _neighbours(relations, predicates, 'out'), _neighbours(relations, predicates, 'in')
+        return lambda id: out(id) + in_(id)
+    field, other = ('s', 'o') if direction == 'out' else ('o', 's')
+    keys, offsets, order = relations.groups[field]
+    composite, column, n = relations.composite[field], relations.columns[other], len(keys)
+
+    def neighbours(id):
+        i = bisect_left(keys, id)
+        if i == n or keys[i] != id: return []
+        lo, hi = offsets[i], offsets[i+1]
+        if predicates is None:
+            return [column[j] for j in order[lo:hi]]
+        res = []
+        for p in predicates:
+            a = bisect_left(composite, p, lo, hi)
+            b = bisect_right(composite, p, a, hi)
+            if a < b: res += [column[j] for j in order[a:b]]
+        return res
+    return neighbours
+
+
+def _ids(start):
+    if isinstance(start, int): return [start]
+    return list(dict.fromkeys(start))
+
+
+def _join(parents, meeting):
+    path, x = [], meeting
+    while x is not None:
+        path.append(x)
+        x = parents[0][x]
+    path.reverse()
+    x = parents[1][meeting]
+    while x is not None:
+        path.append(x)
+        x = parents[1][x]
+    return path
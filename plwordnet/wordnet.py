@@ -1,17 +1,52 @@
 import lzma, gzip, bz2
 import pickle
-import gc
 import re
+import time
 import csv
+import gc
 import xml.etree.ElementTree as etree
 
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from contextlib import contextmanager
 from dataclasses import dataclass
+from functools import lru_cache
 from collections import defaultdict
 from typing import List, Set, Optional
 
 from . import display as show
 from .display import POS_STR
-
+from .graph import Relations
+from .hierarchy import Hierarchy
+from .similarity import Similarity, MEASURES
+from .search import LemmaIndex
+from .mwe import Matcher
+from .sentiment import SentimentIndex
+from .traversal import Traversal, relation_ids
+from . import export
+
+
+XML_TAGS = 'lexical-unit synset synsetrelations lexicalrelations relationtypes'.split()
+RELATION_TAGS = 'synsetrelations lexicalrelations'.split()
+# Names of the counts of elements excluded by the filters of `load`
+EXCLUDED = {'lexical-unit': 'lexical_units', 'synset': 'synsets',
+            'synsetrelations': 'synset_relations', 'lexicalrelations': 'lexical_relations'}
+
+# Chunks of the document parsed in parallel begin at one of these elements, which are never nested
+ROOT_START = re.compile(rb'<[^?!][^>]*>')
+CHUNK_START = re.compile(rb'<(lexical-unit|synset|synsetrelations|lexicalrelations)[\s/>]')
+CHUNK_SIZE = 8 << 20
+DESCRIPTION_BATCH = 2000
+SENTIMENT_CHUNK = 10000
+DESCRIPTION_CACHE_SIZE = 1 << 16
+
+# Characters which may start a construct in a description, and characters which end a field
+DESCRIPTION_SPECIAL = re.compile(r'[#<\[{N]')
+DESCRIPTION_FIELD_END = re.compile(r'[\[{#]')
+
+# Indexes built on first use, which are not pickled
+CACHES = '_hierarchies _similarities _lemma_index _matchers _sentiment_index'.split()
 
 TEXT_ERRORS = re.compile(r'(brak danych|AOds|2A|\n)(; )?')
 
@@ -27,6 +62,7 @@ POLARITY_MAPPING = {
 
 @dataclass
 class RelationType:
+    __slots__ = 'id name type description shortcut display autoreverse pos parent inverse'.split()
     id: int
     name: str
     type: str
@@ -46,6 +82,11 @@ class RelationType:
         else:
             return f'{subject} {self.display} {object}'
 
+    def __setstate__(self, state):
+        # Pickles written by older versions keep the attributes in a dict
+        for name, value in (state[1] if isinstance(state, tuple) else state).items():
+            setattr(self, name, value)
+
 
 @dataclass
 class EmotionalAnnotation:
@@ -111,106 +152,101 @@ class LexicalUnit:
     def _repr_html_(self):
         return show.lexical_unit_html(self)
 
+    def __getstate__(self):
+        # Descriptions parsed on access are not pickled
+        state = {x: getattr(self, x) for x in self.__slots__ if x != 'rich_description'}
+        state['rich_description'] = _RICH_DESCRIPTION.__get__(self)
+        return None, state
+
+
+# Unless `rich_description` was set, it is parsed from the description on first access, and kept
+# in a bounded cache shared by all units (see `description_cache`), not in the unit itself. Every
+# access returns a copy, so that units with the same descriptions do not share one object.
+_RICH_DESCRIPTION = LexicalUnit.rich_description
+
+def _get_rich_description(lu):
+    descr = _RICH_DESCRIPTION.__get__(lu)
+    if descr is None:
+        synset = lu.synset
+        if synset is None:
+            _, error, descr = description_cache(lu.description, '', '')
+        else:
+            _, error, descr = description_cache(lu.description, synset.definition, synset.description)
+        if descr is not None: descr = _copy_description((error, descr))[1]
+    return descr
+
+LexicalUnit.rich_description = property(_get_rich_description, _RICH_DESCRIPTION.__set__)
+
 
 class Wordnet:
     def __init__(self):
         self.lexical_units = {}
         self.synsets = {}
         self.relation_types = {}
-        self.synset_relations = []
-        self.lexical_relations = []
+        self.synset_relations = Relations()
+        self.lexical_relations = Relations()
         self.sentiment_count = 0
         self.description_count = 0
         self.description_errors = 0
+        self.excluded = dict()
 
-        self.lexical_relations_s = defaultdict(set)
-        self.lexical_relations_o = defaultdict(set)
-        self.lexical_relations_p = defaultdict(set)
-        self.synset_relations_s = defaultdict(set)
-        self.synset_relations_o = defaultdict(set)
-        self.synset_relations_p = defaultdict(set)
         self.lexical_units_by_name = defaultdict(list)
         self.relation_by_name = dict()
+        self.morphology = None
+        self._clear_caches()
 
-    def load(self, file, sentiment_file=None, *, clean=True, full_parse=False):
+    def load(self, file, sentiment_file=None, *, clean=True, full_parse=False, workers=None,
+             languages=None, pos=None, domains=None, relations=None, interlingual=True):
         assert hasattr(file, 'read'), 'Argument `file` must be an opened PLWN .xml file'
-        sentiment = defaultdict(list)
-
         if sentiment_file is not None:
             assert hasattr(sentiment_file, 'read'), 'Argument `sentiment_file must be an opened .csv file'
-            rows = csv.reader(sentiment_file, delimiter=',', quotechar='"')
-            head = next(rows)
-            assert len(head) == 9, f'Expected sentiment annotation CSV to have 9 colums, but got {len(head)}'
-            for lemma, variant, pos, charged, emotions, valuations, polarity, example1, example2 in rows:
-                polarity = POLARITY_MAPPING.get(polarity, None)
-                emotions = emotions.strip(';').split(';') if emotions and emotions != 'NULL' else []
-                valuations = valuations.strip(';').split(';') if valuations and valuations != 'NULL' else []
-                examples = []
-                if example1 and example1 != 'NULL': examples.append(example1)
-                if example2 and example2 != 'NULL': examples.append(example2)
-                if not polarity and not emotions and not valuations and not examples: continue
-                self.sentiment_count += 1
-                sentiment[(lemma, int(variant))].append(EmotionalAnnotation(
-                    polarity=polarity, emotions=emotions, valuations=valuations, examples=examples))
-
-        root = etree.parse(file).getroot()
-
-        for e in root.iter('synsetrelations'):
-            a = e.attrib
-            self.synset_relations.append((int(a['parent']), int(a['relation']), int(a['child'])))
-
-        for e in root.iter('lexicalrelations'):
-            a = e.attrib
-            self.lexical_relations.append((int(a['parent']), int(a['relation']), int(a['child'])))
-
-        for e in root.iter('relationtypes'):
-            a = dict(e.attrib)
-            id, name = int(a['id']), a['name']
-            parent = int(a['parent']) if 'parent' in a else None
-            inverse = int(a['reverse']) if 'reverse' in a else None
-            self.relation_types[id] = self.relation_by_name[name] = RelationType(
-                id=id, parent=parent, name=name, type=a['type'], pos=a['posstr'].split(','),
-                description=a['description'], shortcut=a['shortcut'], display=a['display'],
-                autoreverse=a['autoreverse'] == 'true', inverse=inverse)
-
-        for e in root.iter('lexical-unit'):
-            a = dict(e.attrib)
-            id, variant, name, pos, lang = int(a['id']), int(a['variant']), a['name'], a['pos'], 'pl'
-            if pos.endswith(' pwn'): lang = 'en'
-            self.lexical_units[id] = LexicalUnit(
-                id=id, synset=None, name=name, variant=variant, tag_count=int(a['tagcount']),
-                pos_pl=pos, pos=POS_STR[pos], language=lang, domain=a['domain'], description=a['desc'],
-                sentiment=sentiment[(name, variant)], rich_description=None)
-
-        for e in root.iter('synset'):
-            a = dict(e.attrib)
-            id = int(a['id'])
+        subset = None
+        if languages is not None or pos is not None or domains is not None or relations is not None or not interlingual:
+            subset = _Subset(_names(languages), _names(pos), _names(domains), relations, interlingual)
+        if workers is None:
+            return self._load(file, sentiment_file, clean, full_parse, None, subset)
+        assert workers > 0, 'Argument `workers` must be a positive number of processes'
+        with ProcessPoolExecutor(workers) as pool:
+            return self._load(file, sentiment_file, clean, full_parse, pool, subset)
+
+    def _load(self, file, sentiment_file, clean, full_parse, pool, subset=None):
+        # Synsets may refer to units that come later in the file, so synsets are built after the pass
+        synset_records = []
+        columns = {tag: (array('i'), array('i'), array('i')) for tag in RELATION_TAGS}
+        self.excluded = dict()
+        # Equal lemmas, parts of speech and domains of units share one string object
+        strings = dict()
+
+        if pool is None:
+            # Sentiment is attached after the wordnet is read, streaming the file in chunks
+            sentiment = _sentiment_rows(sentiment_file) if sentiment_file is not None else None
+            for tag, values in _records(_iterparse(file, XML_TAGS), columns, subset):
+                self._add_record(tag, values, synset_records, strings)
+        else:
+            # Sentiment is parsed while the wordnet is being read, and chunks of the wordnet are
+            # parsed while the next ones are read. Results are merged in the order of the file.
+            pending = pool.submit(_read_sentiment, sentiment_file.readlines()) if sentiment_file is not None else None
+            for chunk in _parallel_records(file, pool, subset):
+                records, chunk_columns = chunk.result()
+                for tag, values in records:
+                    self._add_record(tag, values, synset_records, strings)
+                for tag, triple in chunk_columns.items():
+                    for column, extra in zip(columns[tag], triple):
+                        column.extend(extra)
+            sentiment = pending.result() if pending is not None else None
+
+        for id, split, abstract, definition, description, units in synset_records:
+            if subset is not None:
+                kept = [x for x in units if x in self.lexical_units]
+                # Synsets whose units were all excluded are excluded as well
+                if units and not kept:
+                    self._add_record('synset', None, None, None)
+                    continue
+                units = kept
+            # Lists are copied, so that they are not overallocated like the lists built by appending
             self.synsets[id] = Synset(
-                id=id, split=int(a['split']), abstract=a['abstract'] == 'true',
-                definition=a.get('definition', ''), description=a.get('desc', ''),
-                lexical_units=[self.lexical_units[int(x.text)] for x in e.findall('unit-id')])
-
-        del root
-        gc.collect()
-
-        for i, x in enumerate(self.synset_relations):
-            s, p, o = x
-            self.synset_relations_s[s].add(i)
-            self.synset_relations_o[o].add(i)
-            self.synset_relations_p[p].add(i)
-
-        for i, x in enumerate(self.lexical_relations):
-            s, p, o = x
-            self.lexical_relations_s[s].add(i)
-            self.lexical_relations_o[o].add(i)
-            self.lexical_relations_p[p].add(i)
-
-        for synset in self.synsets.values():
-            for lu in synset.lexical_units:
-                self.lexical_units[lu.id].synset = synset
-
-        for lu in self.lexical_units.values():
-            self.lexical_units_by_name[lu.name.lower()].append(lu.id)
+                id=id, split=split, abstract=abstract, definition=definition, description=description,
+                lexical_units=[self.lexical_units[x] for x in units][:])
 
         for rel in self.relation_types.values():
             if rel.parent is not None:
@@ -223,8 +259,105 @@ class Wordnet:
             if rel.inverse is not None and rel.inverse.inverse is None:
                 rel.inverse.inverse = rel
 
+        for synset in self.synsets.values():
+            for lu in synset.lexical_units:
+                self.lexical_units[lu.id].synset = synset
+
+        if subset is not None:
+            # Triples of excluded relation types, or with an excluded end, are dropped
+            predicates = relation_ids(self, subset.relations)
+            languages = {
+                'synsetrelations': {x.id: x.lexical_units[0].language if x.lexical_units else None for x in self.synsets.values()},
+                'lexicalrelations': {x.id: x.language for x in self.lexical_units.values()},
+            }
+            for tag in RELATION_TAGS:
+                triples = _subset_triples(columns[tag], predicates, languages[tag], subset.interlingual)
+                dropped = len(columns[tag][0]) - len(triples[0])
+                if dropped: self.excluded[EXCLUDED[tag]] = dropped
+                columns[tag] = triples
+
+        self.synset_relations = Relations(*columns['synsetrelations'])
+        self.lexical_relations = Relations(*columns['lexicalrelations'])
+
+        by_name = self.lexical_units_by_name
+        for lu in self.lexical_units.values():
+            name = lu.name.lower()
+            by_name[strings.setdefault(name, name)].append(lu.id)
+        for name, ids in by_name.items():
+            by_name[name] = ids[:]
+        del strings
+
+        if sentiment is not None: self._attach_sentiment(sentiment)
+        self._clear_caches()
         if clean: self.clean()
-        if full_parse: self.parse_descriptions()
+        if full_parse: self._parse_descriptions(pool)
+
+    def _add_record(self, tag, values, synset_records, strings):
+        if values is None:
+            # Excluded by the filters of `load`
+            name = EXCLUDED[tag]
+            self.excluded[name] = self.excluded.get(name, 0) + 1
+
+        elif tag == 'lexical-unit':
+            id, name, variant, tag_count, pos, domain, description = values
+            name, pos, domain = strings.setdefault(name, name), strings.setdefault(pos, pos), strings.setdefault(domain, domain)
+            self.lexical_units[id] = LexicalUnit(
+                id=id, synset=None, name=name, variant=variant, tag_count=tag_count,
+                pos_pl=pos, pos=POS_STR[pos], language='en' if pos.endswith(' pwn') else 'pl', domain=domain,
+                description=description, sentiment=[], rich_description=None)
+
+        elif tag == 'synset':
+            synset_records.append(values)
+
+        elif tag == 'relationtypes':
+            id, parent, name, type, pos, description, shortcut, display, autoreverse, inverse = values
+            self.relation_types[id] = self.relation_by_name[name] = RelationType(
+                id=id, parent=parent, name=name, type=type, pos=pos, description=description,
+                shortcut=shortcut, display=display, autoreverse=autoreverse, inverse=inverse)
+
+    def load_sentiment(self, file, *, replace=True, chunk_size=SENTIMENT_CHUNK):
+        if isinstance(file, str):
+            file, _ = _smartopen(file, 'rt')
+            with file: return self.load_sentiment(file, replace=replace, chunk_size=chunk_size)
+        assert hasattr(file, 'read'), 'Argument `file` must be an opened .csv file or a path'
+        if replace: self.clear_sentiment()
+        self._attach_sentiment(_sentiment_rows(file), chunk_size)
+
+    def clear_sentiment(self):
+        for id, _ in list(self._sentiment_items()):
+            self.lexical_units[id].sentiment = []
+        self.sentiment_count = 0
+        self._sentiment_index = None
+
+    def _attach_sentiment(self, rows, chunk_size=SENTIMENT_CHUNK):
+        # Rows are ((lemma, variant), annotation) pairs. Units of each lemma in a chunk are visited
+        # once, and get new lists, as several units may have shared one.
+        rows = iter(rows)
+        while True:
+            # Annotations have no reference cycles, but the many new objects would make the garbage
+            # collector scan the whole wordnet over and over
+            with _gc_paused():
+                chunk = list(islice(rows, chunk_size))
+                if not chunk: break
+                self._attach_sentiment_chunk(chunk)
+            self.sentiment_count += len(chunk)
+        self._sentiment_index = None
+
+    def _attach_sentiment_chunk(self, chunk):
+        by_name = defaultdict(dict)
+        for (lemma, variant), annotation in chunk:
+            by_name[lemma.lower()].setdefault((lemma, variant), []).append(annotation)
+        for name, by_key in by_name.items():
+            for id, lemma, variant in self._unit_keys(self.lexical_units_by_name.get(name, ())):
+                annotations = by_key.get((lemma, variant))
+                if annotations is not None:
+                    lu = self.lexical_units[id]
+                    lu.sentiment = lu.sentiment + annotations
+
+    def _unit_keys(self, ids):
+        for id in ids:
+            lu = self.lexical_units[id]
+            yield id, lu.name, lu.variant
 
     def clean(self):
         # remove most common bad text values
@@ -240,67 +373,117 @@ class Wordnet:
         for id in empty_synsets:
             del self.synsets[id]
 
-    def parse_descriptions(self):
+    def parse_descriptions(self, ids=None, *, workers=None):
+        if workers is None:
+            return self._parse_descriptions(None, ids)
+        with ProcessPoolExecutor(workers) as pool:
+            return self._parse_descriptions(pool, ids)
+
+    def _parse_descriptions(self, pool, ids=None):
+        if ids is None:
+            lus = list(self.lexical_units.values())
+        else:
+            lus = [self.lexical_units[x.id if isinstance(x, LexicalUnit) else x] for x in ids]
+        parse = parse_description
+        if pool is not None:
+            # Every distinct text is parsed once in the pool, and each unit gets its own copy of the result
+            texts = set()
+            for lu in lus:
+                texts.add(lu.description)
+                if lu.synset is not None:
+                    texts.add(lu.synset.definition)
+                    texts.add(lu.synset.description)
+            texts = [x for x in texts if x]
+            batches = [texts[i:i+DESCRIPTION_BATCH] for i in range(0, len(texts), DESCRIPTION_BATCH)]
+            results = dict()
+            for batch, parsed in zip(batches, pool.map(_parse_descriptions, batches)):
+                results.update(zip(batch, parsed))
+            parse = lambda text: _copy_description(results[text])
+        for lu in lus:
+            parsed, error, descr = _lexical_unit_rich_description(lu, parse)
+            self.description_count += parsed
+            self.description_errors += error
+            if descr is not None: lu.rich_description = descr
+
+    def description_stats(self):
+        # Counts parsed and malformed descriptions of all units, without keeping the descriptions
+        count = errors = 0
         for lu in self.lexical_units.values():
-            if not lu.description:
-                error, descr = _synset_rich_description(lu.synset)
-                if descr is None: continue
-                descr.from_synset = True
-                lu.rich_description = descr
-            else:
-                error, lu.rich_description = parse_description(lu.description)
-                self.description_count += 1
-                if not error: continue
-                error, descr = _synset_rich_description(lu.synset)
-                if error: self.description_errors += 1
-                if descr is None or error: continue
-                descr.from_synset = True
-                lu.rich_description = descr
+            parsed, error, _ = _lexical_unit_rich_description(lu)
+            count += parsed
+            errors += error
+        self.description_count, self.description_errors = count, errors
+        return count, errors
+
+    @property
+    def lexical_relations_s(self):
+        return self.lexical_relations.index('s')
+
+    @property
+    def lexical_relations_p(self):
+        return self.lexical_relations.index('p')
+
+    @property
+    def lexical_relations_o(self):
+        return self.lexical_relations.index('o')
+
+    @property
+    def synset_relations_s(self):
+        return self.synset_relations.index('s')
+
+    @property
+    def synset_relations_p(self):
+        return self.synset_relations.index('p')
+
+    @property
+    def synset_relations_o(self):
+        return self.synset_relations.index('o')
 
     def lexical_relations_where(self, *, subject=None, predicate=None, object=None):
-        if subject is None and predicate is None and object is None:
-            raise Exception('must specify at least subject, predicate or object')
-        found = None
-        if predicate is not None:
-            assert isinstance(predicate, (int, RelationType)), 'Argument `predicate` must be an int or a RelationType'
-            id = predicate.id if isinstance(predicate, RelationType) else predicate
-            found = _intersection(found, self.lexical_relations_p[id])
-        if subject is not None:
-            assert isinstance(subject, (int, LexicalUnit)), 'Argument `subject` must be an int or a LexicalUnit'
-            id = subject.id if isinstance(subject, LexicalUnit) else subject
-            found = _intersection(found, self.lexical_relations_s[id])
-        if object is not None:
-            assert isinstance(object, (int, LexicalUnit)), 'Argument `object` must be an int or a LexicalUnit'
-            id = object.id if isinstance(object, LexicalUnit) else object
-            found = _intersection(found, self.lexical_relations_o[id])
+        s, p, o = _relation_pattern(subject, predicate, object, LexicalUnit)
         results = []
-        for id in found:
+        for id in self.lexical_relations.where(s, p, o):
             s, p, o = self.lexical_relations[id]
             results.append((self.lexical_units[s], self.relation_types[p], self.lexical_units[o]))
         return results
 
     def synset_relations_where(self, *, subject=None, predicate=None, object=None):
-        if subject is None and predicate is None and object is None:
-            raise Exception('must specify at least subject, predicate or object')
-        found = None
-        if predicate is not None:
-            assert isinstance(predicate, (int, RelationType)), 'Argument `predicate` must be an int or a RelationType'
-            id = predicate.id if isinstance(predicate, RelationType) else predicate
-            found = _intersection(found, self.synset_relations_p[id])
-        if subject is not None:
-            assert isinstance(subject, (int, Synset)), 'Argument `subject` must be an int or a Synset'
-            id = subject.id if isinstance(subject, Synset) else subject
-            found = _intersection(found, self.synset_relations_s[id])
-        if object is not None:
-            assert isinstance(object, (int, Synset)), 'Argument `object` must be an int or a Synset'
-            id = object.id if isinstance(object, Synset) else object
-            found = _intersection(found, self.synset_relations_o[id])
+        s, p, o = _relation_pattern(subject, predicate, object, Synset)
         results = []
-        for id in found:
+        for id in self.synset_relations.where(s, p, o):
             s, p, o = self.synset_relations[id]
             results.append((self.synsets[s], self.relation_types[p], self.synsets[o]))
         return results
 
+    def lexical_relations_batch(self, *, subjects=None, objects=None, predicates=None):
+        field, ids, predicates = _batch_pattern(subjects, objects, predicates)
+        return self.lexical_relations.batch(field, ids, predicates)
+
+    def synset_relations_batch(self, *, subjects=None, objects=None, predicates=None):
+        field, ids, predicates = _batch_pattern(subjects, objects, predicates)
+        return self.synset_relations.batch(field, ids, predicates)
+
+    def lexical_traversal(self, relations=None, direction='out'):
+        return Traversal(self.lexical_relations, relation_ids(self, relations), direction)
+
+    def synset_traversal(self, relations=None, direction='out'):
+        return Traversal(self.synset_relations, relation_ids(self, relations), direction)
+
+    def lexical_graph(self, relations=None, *, pos=None, language=None):
+        return export.graph(self, 'lexical', relations, pos=pos, language=language)
+
+    def synset_graph(self, relations=None, *, pos=None, language=None):
+        return export.graph(self, 'synset', relations, pos=pos, language=language)
+
+    def _node_pos(self, kind):
+        # Yields (id, Polish part of speech) of all synsets or lexical units, where synsets have
+        # the part of speech of their units (or None if they have none)
+        if kind == 'lexical':
+            for lu in self.lexical_units.values(): yield lu.id, lu.pos_pl
+        else:
+            for synset in self.synsets.values():
+                yield synset.id, synset.lexical_units[0].pos_pl if synset.lexical_units else None
+
     def show_relations(self, obj):
         res = ''
         if isinstance(obj, LexicalUnit):
@@ -324,6 +507,73 @@ class Wordnet:
         lus = [lu for lu in lus if lu.variant == variant]
         return lus[0] if lus else None
 
+    def find_form(self, form, *, pos=None, language=None):
+        # The form itself may be a lemma, and other lemmas come from the morphology index
+        lemmas = [(form.lower(), None)]
+        if self.morphology is not None:
+            lemmas += self.morphology.lemmas(form)
+        res, seen = [], set()
+        for lemma, lemma_pos in lemmas:
+            for id in self.lexical_units_by_name.get(lemma, ()):
+                lu = self.lexical_units[id]
+                if id in seen or lemma_pos is not None and lemma_pos != lu.pos: continue
+                if pos is not None and pos != lu.pos and pos != lu.pos_pl: continue
+                if language is not None and language != lu.language: continue
+                seen.add(id)
+                res.append(lu)
+        return res
+
+    def search(self, query, *, prefix=False, max_distance=0, limit=None, pos=None, language=None):
+        assert not (prefix and max_distance), 'Prefix and fuzzy search cannot be combined'
+        index = self.lemma_index()
+        if max_distance:
+            # Closer lemmas come first, so with a limit, further ones are only searched if needed
+            for d in range(1 if limit is not None else max_distance, max_distance + 1):
+                res = self._lemma_units((name for _, name in index.fuzzy(query, d)), pos, language, limit)
+                if len(res) == limit: break
+            return res
+        names = index.prefix(query) if prefix else index.exact(query)
+        return self._lemma_units(names, pos, language, limit)
+
+    def _lemma_units(self, names, pos, language, limit):
+        res = []
+        for name in names:
+            for id in self.lexical_units_by_name[name]:
+                lu = self.lexical_units[id]
+                if pos is not None and pos != lu.pos and pos != lu.pos_pl: continue
+                if language is not None and language != lu.language: continue
+                res.append(lu)
+                if len(res) == limit: return res
+        return res
+
+    def lemma_index(self):
+        if self._lemma_index is None:
+            by_name = self.lexical_units_by_name
+            self._lemma_index = LemmaIndex(x for x in list(by_name) if by_name[x])
+        return self._lemma_index
+
+    def mwe_matcher(self, min_tokens=2):
+        if min_tokens not in self._matchers:
+            self._matchers[min_tokens] = Matcher(list(self.lexical_units_by_name.items()), min_tokens)
+        return self._matchers[min_tokens]
+
+    def sentiment_index(self):
+        if self._sentiment_index is None:
+            self._sentiment_index = SentimentIndex(self._sentiment_items())
+        return self._sentiment_index
+
+    def _sentiment_items(self):
+        for lu in self.lexical_units.values():
+            if lu.sentiment: yield lu.id, lu.sentiment
+
+    def sentiment_where(self, *, polarity=None, emotions=(), valuations=()):
+        ids = self.sentiment_index().where(polarity=polarity, emotions=emotions, valuations=valuations)
+        return [self.lexical_units[id] for id in ids]
+
+    def find_mwes(self, tokens, *, longest=True, overlapping=False, min_tokens=2):
+        for span, ids in self.mwe_matcher(min_tokens).matches(tokens, longest=longest, overlapping=overlapping):
+            yield span, [self.lexical_units[id] for id in ids]
+
     def _get_hypernym_relations(self, interlingual=False):
         assert self.relation_by_name, 'You should load the file first'
 
@@ -348,14 +598,17 @@ class Wordnet:
     def _get_hyponym_relations(self, interlingual=False):
         return [rel.inverse for rel in self._get_hypernym_relations(interlingual) if rel]
 
+    def hierarchy(self, interlingual=False):
+        hierarchy = self._hierarchies.get(interlingual)
+        if hierarchy is None:
+            hierarchy = Hierarchy(self, self._get_hypernym_relations(interlingual))
+            self._hierarchies[interlingual] = hierarchy
+        return hierarchy
+
     def hypernyms(self, synset, interlingual=False):
         assert synset is not None
-        res = []
-        for rel in self._get_hypernym_relations(interlingual):
-            for s, _, _ in self.synset_relations_where(predicate=rel, object=synset):
-                res.append(s)
-
-        return res
+        id = synset.id if isinstance(synset, Synset) else synset
+        return [self.synsets[x] for x in self.hierarchy(interlingual).hypernyms(id)]
 
     def hyponyms(self, synset, interlingual=False):
         assert synset is not None
@@ -370,35 +623,124 @@ class Wordnet:
         # TODO: should we rename full_search to greedy and negate the condition below?
         # None at the end of the path means that we ran into the loop while searching for the hyperonym
 
-        if seen is None:
-            seen = [synset.id]
-        else:
-            seen = seen.copy()
-            seen.append(synset.id)
+        hierarchy = self.hierarchy(interlingual)
+        if seen is None and not hierarchy.reaches_cycle(synset.id):
+            # Without cycles paths do not depend on the synsets seen so far, so use the memoized hypernyms
+            return [[self.synsets[x] for x in path] for path in hierarchy.paths(synset.id, full_search)]
 
-        res = []
-        for hypernym in self.hypernyms(synset=synset, interlingual=interlingual):
-            if hypernym.id in seen:
-                res.append([None])
-                continue
+        return list(self.iter_hypernym_paths(synset, full_search=full_search, interlingual=interlingual, seen=seen))
 
-            paths = self.hypernym_paths(synset=hypernym, full_search=full_search, interlingual=interlingual, seen=seen)
-            for path in paths:
-                res.append([hypernym] + path)
+    def iter_hypernym_paths(self, synset, full_search=False, interlingual=False, max_depth=None, max_paths=None,
+                            timeout=None, seen=None):
+        # Yields the same paths as hypernym_paths, in the same order, from an explicit stack of
+        # hypernym iterators. Paths are cut after max_depth hypernyms, and the search stops after
+        # max_paths paths. TimeoutError is raised, if the search takes more than timeout seconds.
+        assert synset is not None
+        assert max_depth is None or max_depth >= 1, 'Argument `max_depth` must be at least 1'
+        id = synset.id if isinstance(synset, Synset) else synset
+        hierarchy = self.hierarchy(interlingual)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        path, seen = [], set(seen or ()) | {id}
+        stack = [iter(hierarchy.hypernyms(id))]
+        count = 0
+        while stack and (max_paths is None or count < max_paths):
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f'Hypernym paths of synset {id} not found in {timeout} s')
+
+            hypernym = next(stack[-1], None)
+            if hypernym is None:
+                stack.pop()
+                if path: seen.discard(path.pop())
+                continue
 
-            if not paths:
-                res.append([hypernym])
+            if hypernym in seen:
+                # The loop ends the path, and the search goes on with the next hypernym
+                count += 1
+                yield [self.synsets[x] for x in path] + [None]
+                continue
 
             if not full_search:
-                break
-
-        return res
+                stack[-1] = iter(())
+            path.append(hypernym)
+            hypernyms = hierarchy.hypernyms(hypernym)
+            if not hypernyms or max_depth is not None and len(path) >= max_depth:
+                count += 1
+                yield [self.synsets[x] for x in path]
+                path.pop()
+            else:
+                seen.add(hypernym)
+                stack.append(iter(hypernyms))
+
+    def min_depth(self, synset, interlingual=False):
+        id = synset.id if isinstance(synset, Synset) else synset
+        return self.hierarchy(interlingual).min_depth(id)
+
+    def max_depth(self, synset, interlingual=False):
+        id = synset.id if isinstance(synset, Synset) else synset
+        return self.hierarchy(interlingual).max_depth(id)
+
+    def root_hypernyms(self, synset, interlingual=False):
+        id = synset.id if isinstance(synset, Synset) else synset
+        return [self.synsets[x] for x in sorted(self.hierarchy(interlingual).roots(id))]
+
+    def is_a(self, synset, hypernym, interlingual=False):
+        id = synset.id if isinstance(synset, Synset) else synset
+        other = hypernym.id if isinstance(hypernym, Synset) else hypernym
+        return self.hierarchy(interlingual).is_a(id, other)
+
+    def similarity(self, interlingual=False):
+        similarity = self._similarities.get(interlingual)
+        if similarity is None:
+            similarity = Similarity(self, self.hierarchy(interlingual))
+            self._similarities[interlingual] = similarity
+        return similarity
+
+    def lowest_common_hypernyms(self, a, b, interlingual=False):
+        a, b = (x.id if isinstance(x, Synset) else x for x in (a, b))
+        return [self.synsets[x] for x in self.similarity(interlingual).lowest_common_hypernyms(a, b)]
+
+    def shortest_path_distance(self, a, b, interlingual=False):
+        a, b = (x.id if isinstance(x, Synset) else x for x in (a, b))
+        return self.similarity(interlingual).shortest_path_distance(a, b)
+
+    def synset_similarity(self, a, b, measure='path', interlingual=False):
+        a, b = (x.id if isinstance(x, Synset) else x for x in (a, b))
+        similarity = self.similarity(interlingual)
+        assert measure in MEASURES, f'Unknown similarity measure {measure!r}'
+        return getattr(similarity, measure)(a, b)
 
     def dump(self, dst):
-        if not isinstance(dst, str):
+        from . import snapshot
+        if isinstance(dst, str) and dst.endswith(snapshot.EXTENSION):
+            snapshot.dump(self, dst)
+        elif not isinstance(dst, str):
             pickle.dump(self, dst)
-        with open(dst, 'wb') as f:
-            pickle.dump(self, f)
+        else:
+            with open(dst, 'wb') as f:
+                pickle.dump(self, f)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in CACHES: del state[name]
+        # The morphology index is usually memory-mapped, load it again after unpickling
+        state['morphology'] = None
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault('morphology', None)
+        state.setdefault('excluded', dict())
+        # Pickles written by older versions keep relations as lists of triples, next to set indexes
+        for kind in 'synset lexical'.split():
+            for field in 'spo':
+                state.pop(f'{kind}_relations_{field}', None)
+            if isinstance(state[f'{kind}_relations'], list):
+                state[f'{kind}_relations'] = Relations.from_triples(state[f'{kind}_relations'])
+        self.__dict__.update(state)
+        self._clear_caches()
+
+    def _clear_caches(self):
+        self._hierarchies, self._similarities, self._matchers = dict(), dict(), dict()
+        self._lemma_index = self._sentiment_index = None
 
     def __repr__(self):
         props = 'lexical_units synsets relation_types synset_relations lexical_relations'.split()
@@ -411,21 +753,30 @@ class Wordnet:
         res += f'\n  rich descriptions: {self.description_count}'
         if self.description_errors:
             res += f'\n  malformed descriptions: {self.description_errors}'
+        for name, count in self.excluded.items():
+            res += f'\n  excluded {name.replace("_", " ")}: {count}'
         return res
 
     __str__ = __repr__
 
 
 def load(wordnet_src, sentiment_src=None, **kwargs):
+    from . import snapshot
     wn_file = wordnet_src
     if isinstance(wn_file, str):
         wn_file, wordnet_src = _smartopen(wn_file, 'rb')
 
+    # Annotations of pickles and snapshots are replaced by the ones of the given sentiment file
     if wordnet_src.endswith('.pkl'):
-        if sentiment_src is not None:
-            print('INFO: ignoring sentiment file, because loading from .pkl')
         wn = pickle.load(wn_file)
         wn_file.close()
+        if sentiment_src is not None: wn.load_sentiment(sentiment_src)
+        return wn
+
+    if wordnet_src.endswith(snapshot.EXTENSION):
+        wn = snapshot.load(wn_file, **kwargs)
+        wn_file.close()
+        if sentiment_src is not None: wn.load_sentiment(sentiment_src)
         return wn
 
     sent_file = sentiment_src
@@ -443,9 +794,6 @@ def _smartopen(src, mode):
     if src.endswith('.xz'):
         file = lzma.open(src, mode)
         src = src[:-3]
-    if src.endswith('.bz2'):
-        file = bz2.open(src, 'rb')
-        src = src[:-3]
     elif src.endswith('.gz'):
         file = gzip.open(src, mode)
         src = src[:-3]
@@ -457,74 +805,294 @@ def _smartopen(src, mode):
     return file, src
 
 
-def _cleanstr(x):
-    return re.sub(TEXT_ERRORS, '', x).strip()
+def _iterparse(file, tags):
+    # Yields complete top-level elements with the given tags one by one. Every element is
+    # detached from the document as soon as the caller is done with it, so only the element
+    # currently being read is kept in memory, and not the whole tree.
+    return _top_level(etree.iterparse(file, events=('start', 'end')), tags)
 
 
-def _intersection(x, y):
-    if x is None: return y
-    if y is None: return x
-    return x.intersection(y)
+def _top_level(events, tags):
+    # Same as `_iterparse`, but for (event, element) pairs of any parser
+    events = iter(events)
+    _, root = next(events)
+    tags = set(tags)
+    depth = 0
+    for event, e in events:
+        if event == 'start':
+            depth += 1
+            continue
+        depth -= 1
+        if depth: continue
+        if e.tag in tags: yield e
+        root.clear()
 
 
-def _synset_rich_description(synset):
-    if synset.definition:
-        error, descr = parse_description(synset.definition)
+def _cleanstr(x):
+    return re.sub(TEXT_ERRORS, '', x).strip()
+
+
+def _relation_pattern(subject, predicate, object, node_type):
+    # Validates arguments of `*_relations_where` and returns their ids
+    if subject is None and predicate is None and object is None:
+        raise Exception('must specify at least subject, predicate or object')
+    if predicate is not None:
+        assert isinstance(predicate, (int, RelationType)), 'Argument `predicate` must be an int or a RelationType'
+        if isinstance(predicate, RelationType): predicate = predicate.id
+    if subject is not None:
+        assert isinstance(subject, (int, node_type)), f'Argument `subject` must be an int or a {node_type.__name__}'
+        if isinstance(subject, node_type): subject = subject.id
+    if object is not None:
+        assert isinstance(object, (int, node_type)), f'Argument `object` must be an int or a {node_type.__name__}'
+        if isinstance(object, node_type): object = object.id
+    return subject, predicate, object
+
+
+def _batch_pattern(subjects, objects, predicates):
+    # Validates arguments of `*_relations_batch` and returns the queried field, ids and predicate ids
+    if (subjects is None) == (objects is None):
+        raise Exception('must specify either subjects or objects')
+    field, ids = ('s', subjects) if subjects is not None else ('o', objects)
+    if isinstance(predicates, (int, RelationType)):
+        predicates = [predicates]
+    if predicates is not None:
+        predicates = [x.id if isinstance(x, RelationType) else x for x in predicates]
+    return field, ids, predicates
+
+
+def _lexical_unit_rich_description(lu, parse=None):
+    # Returns whether the unit's own description was parsed, whether it was malformed
+    # (and no synset description could replace it) and the resulting description
+    synset = lu.synset
+    definition, synset_description = ('', '') if synset is None else (synset.definition, synset.description)
+    return _rich_description(lu.description, definition, synset_description, parse or parse_description)
+
+
+def _rich_description(description, definition, synset_description, parse=None):
+    parse = parse or parse_description
+    if not description:
+        error, descr = _synset_rich_description(definition, synset_description, parse)
+        if descr is None: return False, False, None
+        descr.from_synset = True
+        return False, False, descr
+    error, own = parse(description)
+    if not error: return True, False, own
+    error, descr = _synset_rich_description(definition, synset_description, parse)
+    if descr is None or error: return True, error, own
+    descr.from_synset = True
+    return True, False, descr
+
+
+def _synset_rich_description(definition, description, parse):
+    if definition:
+        error, descr = parse(definition)
         if not error: return error, descr
-    if synset.description:
-        error, descr = parse_description(synset.description)
+    if description:
+        error, descr = parse(description)
         if not error: return error, descr
     return False, None
 
 
+# Rich descriptions parsed on access, by the description of the unit and the definition and
+# description of its synset. Use `description_cache.cache_info()` to inspect it.
+description_cache = lru_cache(maxsize=DESCRIPTION_CACHE_SIZE)(_rich_description)
+
+
+def _parse_descriptions(texts):
+    return [parse_description(x) for x in texts]
+
+
+def _copy_description(result):
+    error, x = result
+    return error, Description(qualifier=x.qualifier, definition=x.definition, examples=list(x.examples),
+                              links=list(x.links), unparsed=x.unparsed, from_synset=x.from_synset)
+
+
+@contextmanager
+def _gc_paused():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled: gc.enable()
+
+
+def _read_sentiment(lines):
+    return list(_sentiment_rows(lines))
+
+
+def _sentiment_rows(lines):
+    # Yields ((lemma, variant), annotation) pairs of a sentiment annotation CSV
+    rows = csv.reader(lines, delimiter=',', quotechar='"')
+    head = next(rows)
+    assert len(head) == 9, f'Expected sentiment annotation CSV to have 9 colums, but got {len(head)}'
+    for lemma, variant, pos, charged, emotions, valuations, polarity, example1, example2 in rows:
+        polarity = POLARITY_MAPPING.get(polarity, None)
+        emotions = emotions.strip(';').split(';') if emotions and emotions != 'NULL' else []
+        valuations = valuations.strip(';').split(';') if valuations and valuations != 'NULL' else []
+        examples = []
+        if example1 and example1 != 'NULL': examples.append(example1)
+        if example2 and example2 != 'NULL': examples.append(example2)
+        if not polarity and not emotions and not valuations and not examples: continue
+        yield (lemma, int(variant)), EmotionalAnnotation(
+            polarity=polarity, emotions=emotions, valuations=valuations, examples=examples)
+
+
+def _records(elements, columns, subset=None):
+    # Yields (tag, values) of lexical units, synsets and relation types, and appends ids of
+    # relation triples to `columns`. Units excluded by `subset` are yielded with values `None`.
+    for e in elements:
+        tag, a = e.tag, e.attrib
+        if tag in columns:
+            s, p, o = columns[tag]
+            s.append(int(a['parent']))
+            p.append(int(a['relation']))
+            o.append(int(a['child']))
+        elif tag == 'lexical-unit':
+            if subset is not None and not subset.keeps(a['pos'], a['domain']):
+                yield tag, None
+                continue
+            yield tag, (int(a['id']), a['name'], int(a['variant']), int(a['tagcount']), a['pos'], a['domain'], a['desc'])
+        elif tag == 'synset':
+            yield tag, (int(a['id']), int(a['split']), a['abstract'] == 'true', a.get('definition', ''),
+                        a.get('desc', ''), [int(x.text) for x in e.iterfind('unit-id')])
+        elif tag == 'relationtypes':
+            parent = int(a['parent']) if 'parent' in a else None
+            inverse = int(a['reverse']) if 'reverse' in a else None
+            yield tag, (int(a['id']), parent, a['name'], a['type'], a['posstr'].split(','), a['description'],
+                        a['shortcut'], a['display'], a['autoreverse'] == 'true', inverse)
+
+
+def _parallel_records(file, pool, subset=None):
+    # Splits the document into chunks of whole top-level elements, and submits them to the pool
+    # as they are read. Yields futures of `_chunk_records` in the order of the document, as soon
+    # as they are done, so that they can be merged while the rest of the file is read.
+    header, buf, pending = None, b'', []
+    while True:
+        block = file.read(CHUNK_SIZE)
+        buf += block
+        if header is None:
+            # Every chunk is parsed after the declarations and the start tag of the root
+            m = ROOT_START.search(buf)
+            if m is None and block: continue
+            end = m.end() if m else len(buf)
+            header, buf = buf[:end], buf[end:]
+        end = 0 if block else len(buf)
+        if block and len(buf) >= CHUNK_SIZE:
+            # Split before the last element that starts in the buffer, which may be incomplete
+            for m in CHUNK_START.finditer(buf, len(buf) // 2): end = m.start()
+        if end:
+            pending.append(pool.submit(_chunk_records, header, buf[:end], subset))
+            buf = buf[end:]
+        while pending and (pending[0].done() or not block):
+            yield pending.pop(0)
+        if not block: break
+
+
+def _chunk_records(header, chunk, subset=None):
+    # Parses a chunk of top-level elements after the header of the document, which opens the root
+    columns = {tag: (array('i'), array('i'), array('i')) for tag in RELATION_TAGS}
+    parser = etree.XMLPullParser(events=('start', 'end'))
+    def events():
+        parser.feed(header)
+        for i in range(0, len(chunk), 1 << 20):
+            parser.feed(chunk[i:i + (1 << 20)])
+            yield from parser.read_events()
+    return list(_records(_top_level(events(), XML_TAGS), columns, subset)), columns
+
+
+@dataclass
+class _Subset:
+    # Filters given to `Wordnet.load`, where `None` keeps everything
+    __slots__ = 'languages pos domains relations interlingual'.split()
+    languages: Optional[Set[str]]
+    pos: Optional[Set[str]]
+    domains: Optional[Set[str]]
+    relations: object
+    interlingual: bool
+
+    def keeps(self, pos_pl, domain):
+        if self.languages is not None and ('en' if pos_pl.endswith(' pwn') else 'pl') not in self.languages: return False
+        if self.pos is not None and pos_pl not in self.pos and POS_STR.get(pos_pl) not in self.pos: return False
+        return self.domains is None or domain in self.domains
+
+
+def _names(x):
+    if x is None: return None
+    return {x} if isinstance(x, str) else set(x)
+
+
+def _subset_triples(columns, predicates, languages, interlingual):
+    # Keeps triples with one of `predicates` (or any), between nodes in `languages` (a dict from
+    # ids to their language), which have the same language unless `interlingual`
+    res = array('i'), array('i'), array('i')
+    for s, p, o in zip(*columns):
+        if predicates is not None and p not in predicates: continue
+        a, b = languages.get(s, False), languages.get(o, False)
+        if a is False or b is False or not interlingual and a != b: continue
+        res[0].append(s)
+        res[1].append(p)
+        res[2].append(o)
+    return res
+
+
 def parse_description(text):
+    # Runs of plain text are skipped to the next character which may start a construct, and
+    # constructs are skipped with `str.find`, instead of walking the text one character at a time
     res, examples, links, unparsed = dict(), [], [], []
     i, n, error = 0, len(text), False
+    find = text.find
     while i < n:
+        m = DESCRIPTION_SPECIAL.search(text, i)
+        j = m.start() if m else n
+        if j > i:
+            chunk = text[i:j]
+            unparsed.append(chunk)
+            if not error and chunk.strip(' '): error = True
+            i = j
+            if i == n: break
         char = text[i]
         if char == '#' and i+2 < n and text[i+2] == 'A':
             # TODO(max): merge emotional annotations
             i += 6
-            while i < n and text[i] != '{': i += 1
-            while i < n and text[i] != '}': i += 1
-            while i < n and text[i] != '[': i += 1
-            while i < n and text[i] != ']': i += 1
+            for c in '{}[]':
+                j = find(c, i)
+                i = n if j == -1 else j
             while i < n and text[i] == ' ': i += 1
-            while i < n and text[i] != '[': i += 1
-            while i < n and text[i] != ']': i += 1
+            for c in '[]':
+                j = find(c, i)
+                i = n if j == -1 else j
             i += 1
         elif char == '<':
             # TODO(max): find out what these tags do
-            j = text.find('>', i)
+            j = find('>', i)
             if j == -1: j = n
             i = j + 1
         elif char == '#' and i+2 < n:
             marker = text[i+2]
             i += 4
-            chars = []
-            while i < n and text[i] not in '[{#':
-                chars.append(text[i])
-                i += 1
-            res[marker] = ''.join(chars).strip(': ')
-        elif char == '[' and text[i:i+3] == '[##':
+            m = DESCRIPTION_FIELD_END.search(text, i)
+            j = m.start() if m else n
+            res[marker] = text[i:j].strip(': ')
+            i = max(i, j)
+        elif char == '[' and text.startswith('[##', i):
             i += 5
-            j = text.find(']', i)
+            j = find(']', i)
             if j == -1: j = n
             examples.append(text[i:j].strip(': '))
             i = j + 1
-        elif char == '{' and text[i:i+3] == '{##':
+        elif char == '{' and text.startswith('{##', i):
             i += 5
-            j = text.find('}', i)
+            j = find('}', i)
             if j == -1: j = n
             links.append(text[i:j].strip())
             i = j + 1
-        elif text[i:i+2] == 'NP':
+        elif char == 'N' and text.startswith('NP', i):
             i += 2
         else:
-            unparsed.append(text[i])
+            unparsed.append(char)
             i += 1
-            if char != ' ':
-                error = True
+            error = True
     return error, Description(qualifier=res.get('K', None), definition=res.get('D', ''),
                        examples=examples, links=links, unparsed=''.join(unparsed),from_synset=False)
-
@@ -28,5 +28,6 @@ setup(
     python_requires='>=3.7',
     setup_requires=['pip', 'setuptools', 'wheel'],
     install_requires=[],
+    extras_require={'arrow': ['pyarrow>=7'], 'scipy': ['numpy', 'scipy']},
 )
 